@@ -1,24 +1,70 @@
-import dash
-import dash_bootstrap_components as dbc
-from dash import dcc, html
-from modules.data_processing import load_and_preprocess_data
-from modules.layout import create_layout
-from callbacks.update_callbacks import register_callbacks
-
-# Initialize app
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-app.title = "Kitchenware Dashboard"
-
-# Load data
-df = load_and_preprocess_data('data/amazon_kitchenware.csv')
-
-# Layout
-app.layout = create_layout(df)
-
-# Callbacks
-register_callbacks(app, df)
-
-# Run
-if __name__ == "__main__":
-    app.run_server(debug=True)
-
+import os
+
+from modules.startup import Startup, register_health_endpoint
+
+# startup phases are timed from here on and reported by the health endpoint
+startup = Startup()
+
+with startup.phase('import_dash'):
+    import dash
+    import dash_bootstrap_components as dbc
+    from dash import dcc, html
+with startup.phase('import_app'):
+    # light modules only: pandas, plotly, NLTK and scikit-learn load with the data below
+    from modules.catalog_holder import CatalogHolder
+    from modules.layout import create_layout
+    from callbacks.update_callbacks import register_callbacks
+    from utils.constants import DEFERRED_STARTUP, HEALTH_PATH, HOT_RELOAD, METRICS_PATH, METRICS_TOKEN_ENV
+    from utils.profiling import register_metrics_endpoint
+
+# Initialize app
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+app.title = "Kitchenware Dashboard"
+
+DATA_PATH = 'data/amazon_kitchenware.csv'
+# empty until load_catalog swaps the first catalog in; callbacks wait for it
+catalog = CatalogHolder()
+watcher = None
+
+def load_catalog(startup):
+    global watcher
+    with startup.phase('import_data'):
+        from modules.catalog import Catalog
+        from modules.ingestion import CatalogWatcher
+        from modules.shared_dataset import load_worker_dataset
+    # Load data (shared read-only view when published, else the preprocessed snapshot or a full load)
+    with startup.phase('load_dataset'):
+        df = load_worker_dataset(DATA_PATH)
+    with startup.phase('build_catalog'):
+        catalog.swap(Catalog.build(df))
+    # so the first click does not pay for importing plotly
+    with startup.phase('import_renderers'):
+        import callbacks.renderers
+    # Pick up new or edited CSVs in data/ without a restart
+    if HOT_RELOAD:
+        watcher = CatalogWatcher(catalog, 'data', initial_files=[DATA_PATH]).start()
+
+if __name__ == '__mp_main__':
+    # a spawned pool worker (modules/sentiment_analysis.py) re-imports this file under that
+    # name; it only runs module functions, so it must not load a catalog of its own
+    pass
+elif DEFERRED_STARTUP:
+    # the layout shell and health checks are served while the data loads
+    startup.run_in_background(load_catalog)
+elif not startup.run(load_catalog).ready:
+    raise SystemExit("catalog failed to load, see the log")
+
+# Layout
+app.layout = create_layout(catalog.current.df if catalog.ready else None)
+
+# Callbacks
+register_callbacks(app, catalog)
+
+# Span timings and cache stats for token holders; readiness for load balancers
+metrics_token = os.environ.get(METRICS_TOKEN_ENV)
+register_metrics_endpoint(app.server, METRICS_PATH, metrics_token)
+register_health_endpoint(app.server, HEALTH_PATH, startup, metrics_token)
+
+# Run
+if __name__ == "__main__":
+    app.run_server(debug=True)
@@ -0,0 +1,27 @@
+// Browser-side formatting for the purely presentational outputs (see CLIENTSIDE_FORMATTING).
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: {
+        // payload: {price, was_ratio}; offers: [[label, delta_pct], ...]
+        format_prices: function(payload, offers) {
+            var price = payload ? payload.price : null;
+            var known = price !== null && price !== undefined && !isNaN(price);
+            var money = function(v) {
+                // Python rounds exact half-cents to even, toFixed rounds them up; in binary
+                // floating point the exact half-cents are the odd multiples of 1/8
+                var eighths = v * 8;
+                if (Number.isInteger(eighths) && eighths % 2 !== 0) {
+                    var cents = Math.floor(v * 100);
+                    if (cents % 2 === 0) { return '$' + (cents / 100).toFixed(2); }
+                }
+                return '$' + v.toFixed(2);
+            };
+
+            var priceStr = known ? money(price) : 'N/A';
+            var savings = known ? 'Save ' + money(price * payload.was_ratio - price) : '';
+            var comps = (offers || []).map(function(offer) {
+                return offer[0] + '  ' + (known ? money(price * (1 + offer[1])) : 'N/A');
+            });
+            return [priceStr, savings].concat(comps);
+        }
+    }
+});
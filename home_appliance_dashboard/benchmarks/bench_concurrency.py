@@ -0,0 +1,183 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_pipeline import RESULTS_DIR, build_callbacks, latency_summary, time_pipeline
+from benchmarks.synthetic import TEMPLATE_PATH, write_catalog
+
+# Many concurrent product clicks against one catalog: every output must match a
+# single-threaded reference, and throughput is reported per thread / process count.
+
+_worker = {}
+
+
+def load_catalog(rows, tmp, template, seed):
+    # synthetic catalog, scored into a private sentiment cache
+    from modules.sentiment_analysis import SCORER_VERSION
+    from modules.sentiment_cache import SentimentCache
+
+    path = write_catalog(rows, os.path.join(tmp, 'catalog.csv'), template, seed)
+    cache = SentimentCache(os.path.join(tmp, 'sentiment.sqlite'), SCORER_VERSION, max(rows, 1))
+    df, _, _ = time_pipeline(path, None, cache)
+    cache.close()
+    return df
+
+
+def click(resolve, parts, asin):
+    # one product selection (resolve, then every panel) -> digest of all outputs
+    from callbacks.renderers import serialize_output
+
+    resolved = resolve(asin, None, True, None)
+    digest = hashlib.sha1()
+    for key, fn in parts.items():
+        digest.update(key.encode('utf-8'))
+        digest.update(json.dumps(serialize_output(fn(resolved)), sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def timed_clicks(resolve, parts, asins):
+    digests, latencies = [], []
+    for asin in asins:
+        start = time.perf_counter()
+        digests.append(click(resolve, parts, asin))
+        latencies.append(time.perf_counter() - start)
+    return digests, latencies
+
+
+def run_threads(resolve, parts, schedule, threads):
+    # the schedule split over `threads` threads sharing one set of callbacks and one catalog
+    chunks = [schedule[i::threads] for i in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda chunk: timed_clicks(resolve, parts, chunk), chunks))
+    return time.perf_counter() - start, chunks, results
+
+
+def _init_process(df, tmp, cache_size, barrier):
+    # each process builds its own callbacks over the stores the parent already wrote; pool
+    # processes are daemonic and cannot start render processes of their own
+    _, _, resolve, _, parts = build_callbacks(df, tmp, cache_size, render_processes=0)
+    _worker.update(resolve=resolve, parts=parts, barrier=barrier)
+
+
+def _process_chunk(chunk):
+    # every process waits here until all are initialized, so only the clicks are timed
+    _worker['barrier'].wait()
+    start = time.perf_counter()
+    digests, latencies = timed_clicks(_worker['resolve'], _worker['parts'], chunk)
+    return digests, latencies, time.perf_counter() - start
+
+
+def run_processes(df, tmp, cache_size, schedule, processes):
+    chunks = [schedule[i::processes] for i in range(processes)]
+    barrier = multiprocessing.Barrier(processes)
+    with multiprocessing.Pool(processes, initializer=_init_process, initargs=(df, tmp, cache_size, barrier)) as pool:
+        # one task per process: a process blocked at the barrier cannot take a second one
+        pending = [pool.apply_async(_process_chunk, (chunk,)) for chunk in chunks]
+        outputs = [p.get() for p in pending]
+    seconds = max(elapsed for _, _, elapsed in outputs)
+    return seconds, chunks, [(digests, latencies) for digests, latencies, _ in outputs]
+
+
+def summarize(mode, workers, seconds, chunks, results, reference):
+    mismatches = sum(digest != reference[asin]
+                     for chunk, (digests, _) in zip(chunks, results) for asin, digest in zip(chunk, digests))
+    latencies = [x for _, lat in results for x in lat]
+    return {
+        'mode': mode,
+        'workers': workers,
+        'requests': len(latencies),
+        'seconds': seconds,
+        'throughput_rps': len(latencies) / seconds if seconds else 0.0,
+        'latency_ms': latency_summary(latencies),
+        'mismatches': int(mismatches),
+    }
+
+
+def worker_counts(limit):
+    counts = [1]
+    while counts[-1] * 2 <= limit:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != limit:
+        counts.append(limit)
+    return counts
+
+
+def main(argv=None):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Load-test the product callbacks from many threads / processes.")
+    parser.add_argument('--rows', type=int, default=2000, help="synthetic catalog size")
+    parser.add_argument('--products', type=int, default=200, help="distinct ASINs clicked")
+    parser.add_argument('--requests', type=int, default=400, help="clicks per run")
+    parser.add_argument('--threads', type=int, nargs='+', default=worker_counts(2 * cpus))
+    parser.add_argument('--processes', type=int, nargs='*', default=worker_counts(cpus))
+    parser.add_argument('--render-processes', type=int, default=None,
+                        help="processes the threaded runs draw panels in (default: the data service's)")
+    parser.add_argument('--cache', action='store_true', help="keep the rendered-output cache on (off: every click renders)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--template', default=TEMPLATE_PATH)
+    parser.add_argument('--out', default=os.path.join(RESULTS_DIR, 'concurrency.json'))
+    args = parser.parse_args(argv)
+    cache_size = None if args.cache else 0
+
+    with tempfile.TemporaryDirectory(prefix='bench-') as tmp:
+        df = load_catalog(args.rows, tmp, args.template, args.seed)
+        _, _, resolve, _, parts = build_callbacks(df, tmp, cache_size, args.render_processes)
+        rng = random.Random(args.seed)
+        asins = rng.sample(df['asin'].tolist(), min(args.products, len(df)))
+        schedule = [rng.choice(asins) for _ in range(args.requests)]
+        # single-threaded reference output for every ASIN clicked
+        reference = dict(zip(asins, timed_clicks(resolve, parts, asins)[0]))
+
+        runs = []
+        for threads in args.threads:
+            runs.append(summarize('thread', threads, *run_threads(resolve, parts, schedule, threads), reference))
+        for processes in args.processes:
+            runs.append(summarize('process', processes, *run_processes(df, tmp, cache_size, schedule, processes), reference))
+
+    base = {}
+    for run in runs:
+        base.setdefault(run['mode'], run['throughput_rps'] / run['workers'])
+        # speedup over the mode's first run, per worker; 1.0 efficiency is linear scaling
+        run['speedup'] = run['throughput_rps'] / base[run['mode']]
+        run['efficiency'] = run['speedup'] / run['workers']
+        print(f"{run['mode']:>7} x{run['workers']:<3} {run['throughput_rps']:8.1f} clicks/s  speedup {run['speedup']:.2f}"
+              f"  p95 {run['latency_ms']['p95']:.1f}ms  mismatches {run['mismatches']}")
+
+    results = {
+        'meta': {
+            'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'cpus': cpus,
+            'rows': args.rows,
+            'products': len(asins),
+            'cache': args.cache,
+            'render_processes': args.render_processes,
+            'seed': args.seed,
+        },
+        'runs': runs,
+    }
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {args.out}")
+    # any output differing from the single-threaded reference is a failure
+    return 1 if any(run['mismatches'] for run in runs) else 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.bench_concurrency --rows 10000 --threads 1 2 4 8 --processes 1 2 4
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import TEMPLATE_PATH, write_catalog
+
+# default output directory (git-ignored)
+RESULTS_DIR = 'benchmarks/results'
+# a stage or callback percentile this much slower than the baseline counts as a regression
+REGRESSION_RATIO = 1.2
+# timings below these are too noisy to compare
+STAGE_FLOOR_SECONDS = 0.05
+CALLBACK_FLOOR_MS = 1.0
+PERCENTILES = (50, 95, 99)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def latency_summary(samples):
+    ms = np.asarray(samples) * 1000
+    summary = {f"p{p}": float(np.percentile(ms, p)) for p in PERCENTILES}
+    summary.update(mean=float(ms.mean()), max=float(ms.max()), n=len(ms))
+    return summary
+
+
+def time_pipeline(path, workers, cache):
+    # The dashboard's own load_and_preprocess_data, scoring through `cache`; stage times are
+    # its pipeline.* spans (summed over chunks when the file is streamed). A second load with
+    # the sentiment cache warm is what a restart costs; its stages get a _cached suffix.
+    from modules.data_processing import load_and_preprocess_data
+    from modules.sentiment_analysis import set_default_sentiment_cache
+    from utils.profiling import reset_spans, span_report
+
+    stages, rss = {}, {}
+    previous = set_default_sentiment_cache(cache)
+    try:
+        for suffix in ('', '_cached'):
+            reset_spans()
+            start = time.perf_counter()
+            df = load_and_preprocess_data(path, sentiment_workers=workers)
+            stages[f"load{suffix}"] = time.perf_counter() - start
+            rss[f"load{suffix}"] = peak_rss_mb()
+            for name, report in span_report().items():
+                if name.startswith('pipeline.'):
+                    stages[name[len('pipeline.'):] + suffix] = report['count'] * report['mean_ms'] / 1000
+    finally:
+        set_default_sentiment_cache(previous)
+    return df, stages, rss
+
+
+def build_callbacks(df, tmp, cache_size=None, render_processes=None):
+    # the dashboard's registered callback functions over df, unwrapped so they can be called
+    # directly, as Dash would for a click / search; catalog caches live under tmp. Panels are
+    # drawn in render_processes worker processes (None: the data service's default).
+    import dash
+    from callbacks.update_callbacks import register_callbacks
+    from modules.catalog import Catalog
+    from modules.catalog_holder import CatalogHolder
+    from modules.data_service import DataService
+    from modules.layout import create_layout
+    from utils.constants import PRODUCT_CACHE_SIZE
+
+    start = time.perf_counter()
+    holder = CatalogHolder(Catalog.build(df, price_store_dir=os.path.join(tmp, 'price_store'),
+                                         regret_model_path=os.path.join(tmp, 'regret_model.joblib')))
+    build_seconds = time.perf_counter() - start
+    app = dash.Dash(__name__)
+    app.layout = create_layout(df)
+    service = DataService(holder, cache_size=PRODUCT_CACHE_SIZE if cache_size is None else cache_size,
+                          processes=render_processes)
+    register_callbacks(app, holder, service=service)
+    funcs = {key: getattr(entry['callback'], '__wrapped__', entry['callback'])
+             for key, entry in app.callback_map.items() if 'callback' in entry}
+
+    def find(output):
+        return next(fn for key, fn in funcs.items() if output in key)
+
+    resolve = find('resolved-asin.data')
+    search = find('product-selector.value')
+    # the panels of one click, as the split update_product callbacks
+    parts = {key: fn for key, fn in funcs.items() if key != 'resolved-asin.data'
+             and fn.__code__.co_varnames[:1] == ('asin',)}
+    return holder, build_seconds, resolve, search, parts
+
+
+def time_callbacks(df, tmp, clicks, seed):
+    _, build_seconds, resolve, search, parts = build_callbacks(df, tmp)
+    rng = random.Random(seed)
+    asins = df['asin'].tolist()
+    words = [w for t in df['title'].head(1000) for w in str(t).split() if len(w) > 3]
+    timings = {'search_to_selector': [], 'resolve_asin': [], 'update_product': []}
+    timings.update({key: [] for key in parts})
+    for _ in range(clicks):
+        query = ' '.join(rng.sample(words, 1 + rng.randrange(2)))
+        t0 = time.perf_counter()
+        search(query)
+        timings['search_to_selector'].append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        asin = resolve(rng.choice(asins), None, True, None)
+        t1 = time.perf_counter()
+        timings['resolve_asin'].append(t1 - t0)
+        for key, fn in parts.items():
+            t2 = time.perf_counter()
+            fn(asin)
+            timings[key].append(time.perf_counter() - t2)
+        timings['update_product'].append(time.perf_counter() - t0)
+    return build_seconds, {name: latency_summary(s) for name, s in timings.items()}
+
+
+def run_size(rows, workers, clicks, seed, template):
+    # one catalog size in a fresh process, so peak RSS belongs to this size alone
+    from modules.sentiment_analysis import SCORER_VERSION
+    from modules.sentiment_cache import SentimentCache
+
+    with tempfile.TemporaryDirectory(prefix='bench-') as tmp:
+        path = write_catalog(rows, os.path.join(tmp, 'catalog.csv'), template, seed)
+        # private cache: synthetic texts never reach the dashboard's own cache
+        cache = SentimentCache(os.path.join(tmp, 'sentiment.sqlite'), SCORER_VERSION, max(rows, 1))
+        df, stages, rss = time_pipeline(path, workers, cache)
+        cache.close()
+        build_seconds, callbacks = time_callbacks(df, tmp, clicks, seed)
+        stages['catalog_build'] = build_seconds
+        return {
+            'rows': rows,
+            'csv_bytes': os.path.getsize(path),
+            'stages': stages,
+            'peak_rss_mb_after': rss,
+            'peak_rss_mb': peak_rss_mb(),
+            'callbacks_ms': callbacks,
+        }
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    # lines describing every stage / callback p95 slower than baseline by more than ratio
+    old = {run['rows']: run for run in baseline['runs']}
+    regressions = []
+    for run in results['runs']:
+        base = old.get(run['rows'])
+        if base is None:
+            continue
+        pairs = [(f"stage {k}", v, base['stages'].get(k), STAGE_FLOOR_SECONDS) for k, v in run['stages'].items()]
+        pairs += [(f"callback {k} p95", v['p95'], base['callbacks_ms'].get(k, {}).get('p95'), CALLBACK_FLOOR_MS)
+                  for k, v in run['callbacks_ms'].items()]
+        for name, new, before, floor in pairs:
+            if before and max(new, before) >= floor and new > before * ratio:
+                regressions.append(f"{run['rows']} rows: {name} {before:.4g} -> {new:.4g} ({new / before:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the data pipeline and callbacks on synthetic catalogs.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000])
+    parser.add_argument('--workers', type=int, default=None, help="sentiment worker processes")
+    parser.add_argument('--clicks', type=int, default=200, help="simulated product selections per size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--template', default=TEMPLATE_PATH)
+    parser.add_argument('--out', default=os.path.join(RESULTS_DIR, 'pipeline.json'))
+    parser.add_argument('--baseline', help="earlier results JSON; exit 1 on regressions")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for rows in args.rows:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            run = pool.submit(run_size, rows, args.workers, args.clicks, args.seed, args.template).result()
+        runs.append(run)
+        print(f"{rows} rows: " + ", ".join(f"{k} {v:.3f}s" for k, v in run['stages'].items())
+              + f"; click p95 {run['callbacks_ms']['update_product']['p95']:.1f}ms; peak RSS {run['peak_rss_mb']:.0f}MB")
+
+    results = {
+        'meta': {
+            'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'cpus': os.cpu_count(),
+            'workers': args.workers,
+            'clicks': args.clicks,
+            'seed': args.seed,
+        },
+        'runs': runs,
+    }
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f))
+        for line in regressions:
+            print("REGRESSION", line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.bench_pipeline --rows 10000 100000 --baseline benchmarks/results/pipeline.json
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+TEMPLATE_PATH = 'data/amazon_kitchenware.csv'
+
+
+def make_catalog(rows, template_path=TEMPLATE_PATH, seed=0):
+    # `rows` products with the template's schema: each is a template row with a fresh ASIN,
+    # jittered price/rating/reviews and a unique description (so nothing is a cache hit)
+    template = pd.read_csv(template_path)
+    rng = np.random.default_rng(seed)
+    pick = rng.integers(0, len(template), size=rows)
+    df = template.iloc[pick].reset_index(drop=True)
+    ids = pd.Series(np.arange(rows)).map('SYN{:07d}'.format)
+
+    price = pd.to_numeric(df['price/value'], errors='coerce').to_numpy()
+    df['price/value'] = np.round(price * rng.lognormal(0.0, 0.2, rows), 2)
+    df['stars'] = np.clip(np.round(df['stars'].to_numpy() + rng.normal(0, 0.2, rows), 1), 1.0, 5.0)
+    df['reviewsCount'] = (df['reviewsCount'].to_numpy() * rng.lognormal(0.0, 0.5, rows)).astype(np.int64)
+    df['title'] = df['title'] + ' #' + ids.str[3:]
+    df['description'] = df['description'].fillna('') + ' Model ' + ids + '.'
+    df['asin'] = ids
+    df['url'] = 'https://www.amazon.com/dp/' + ids
+    return df
+
+
+def write_catalog(rows, path, template_path=TEMPLATE_PATH, seed=0):
+    make_catalog(rows, template_path, seed).to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.synthetic 100000 /tmp/catalog-100k.csv
+    write_catalog(int(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,141 @@
+import functools
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from modules.regret_prediction import RISK_LABELS, RISK_METRICS
+from utils.constants import COMPETITOR_OFFERS, TOPICS_SHOWN, WAS_PRICE_RATIO
+from utils.profiling import span
+
+# Rendering for the product panels, one render_<part>(row, **inputs) per callback. `inputs`
+# are what a renderer declares with @reads besides the product row (price history, category
+# aggregates, volatility); the data service fetches them through get_history /
+# get_category_stats from the catalog version being rendered.
+# Kept out of update_callbacks so plotly and pandas load on the first render, not at app import.
+
+def reads(*inputs):
+    def declare(render):
+        render.inputs = inputs
+        return render
+    return declare
+
+def normalize(x):
+    x = np.array(x, dtype=float)
+    if x.max() == x.min():
+        return np.zeros_like(x)
+    return (x - x.min()) / (x.max() - x.min())
+
+def serialize_output(output):
+    # figures -> plain JSON dicts, which Dash can send without re-validating through plotly
+    if isinstance(output, tuple):
+        return tuple(serialize_output(o) for o in output)
+    return json.loads(output.to_json()) if isinstance(output, go.Figure) else output
+
+def serialized(render):
+    # render with its output passed through serialize_output, keeping its declared inputs; a
+    # partial over module functions, so it pickles (the data service's render processes)
+    wrapper = functools.partial(_render_serialized, render)
+    wrapper.inputs = getattr(render, 'inputs', ())
+    return wrapper
+
+def _render_serialized(render, row, **inputs):
+    return serialize_output(render(row, **inputs))
+
+def render_header(row):
+    # Basic product fields
+    title = row.get('title', 'Unknown Product')
+    brand = row.get('brand', '')
+    # Sub text (SKU / rating)
+    stars = row.get('stars', '')
+    reviews = int(row.get('reviewsCount', 0)) if not pd.isna(row.get('reviewsCount', 0)) else 0
+    sub = f"Brand: {brand} · Rating: {stars} · Reviews: {reviews}"
+
+    # Regret / lowest-in-year badge (precomputed by regret_prediction.score_risk)
+    badge_text = "Lowest in 1 year — No Regret!" if row.get('no_regret') else ""
+
+    return title, sub, badge_text
+
+def render_payload(row):
+    # everything the clientside formatter needs
+    price_val = row.get('price/value', np.nan)
+    return {'price': None if pd.isna(price_val) else float(price_val), 'was_ratio': WAS_PRICE_RATIO}
+
+@reads('history')
+def render_price_chart(row, history):
+    # Stored price history and price line figure (Element B)
+    with span('price_chart.figure'):
+        return price_figure(history)
+
+def price_figure(hist_df):
+    price_fig = px.line(hist_df, x='date', y='price', title='', labels={'price': 'Price', 'date': 'Date'})
+    # mark sale points as markers where big dip occurred (precomputed in the store)
+    dips = hist_df['dip']
+    price_fig.add_trace(go.Scatter(
+        x=hist_df.loc[dips, 'date'],
+        y=hist_df.loc[dips, 'price'],
+        mode='markers+text',
+        marker=dict(size=10, color='red'),
+        text=['SALE'] * dips.sum(),
+        textposition='top center',
+        name='Promotions'
+    ))
+    return price_fig
+
+@reads('category_stats', 'volatility')
+def render_kpis(row, category_stats, volatility):
+    # KPIs (Element D) — compute over category
+    lowest = category_stats['price_min']
+    avg = category_stats['price_mean']
+    ret_rate = row.get('risk_return', 0.0)
+
+    # Format KPI strings
+    kpi_low_s = f"${lowest:.2f}" if not pd.isna(lowest) else "N/A"
+    kpi_avg_s = f"${avg:.2f}" if not pd.isna(avg) else "N/A"
+    kpi_vol_s = f"{volatility:.2f}"
+    kpi_ret_s = f"{int(ret_rate * 100)}%"
+    return kpi_low_s, kpi_avg_s, kpi_vol_s, kpi_ret_s
+
+@reads('category_stats')
+def render_topics(row, category_stats):
+    # Review topics (Element E): the complaint keywords most mentioned in the category's reviews,
+    # else (no review text, or no complaints in it) the description polarity distribution
+    topics = list(category_stats['topic_counts'].items())[:TOPICS_SHOWN]
+    if topics:
+        x, y = [keyword for keyword, _ in topics], [count for _, count in topics]
+        x_title, y_title = 'Topic', 'Products'
+    else:
+        x, y = ['Positive','Neutral','Negative'], list(category_stats['sentiment_counts'])
+        x_title, y_title = 'Sentiment', 'Count'
+    # graph_objects directly: px.bar costs ~60ms a figure
+    topics_fig = go.Figure(go.Bar(x=x, y=y))
+    topics_fig.update_layout(title='', xaxis_title=x_title, yaxis_title=y_title)
+    return topics_fig
+
+def render_radar(row):
+    # Radar chart (Element F): this product's precomputed risk metrics, normalized
+    normed = normalize([row[m] for m in RISK_METRICS])
+
+    radar_fig = go.Figure()
+    radar_fig.add_trace(go.Scatterpolar(r=normed, theta=RISK_LABELS, fill='toself', name='Risk Radar'))
+    radar_fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 1])), showlegend=False)
+    return radar_fig
+
+def render_prices(row):
+    # server-side twin of dashboard.format_prices in assets/clientside.js
+    price_val = row.get('price/value', np.nan)
+    price_str = f"${price_val:.2f}" if not pd.isna(price_val) else "N/A"
+
+    # Simulate "was" price and savings if applicable (just sample)
+    was_price = price_val * WAS_PRICE_RATIO if not pd.isna(price_val) else np.nan
+    savings = f"Save ${was_price - price_val:.2f}" if (not pd.isna(price_val) and not pd.isna(was_price)) else ""
+
+    # Competitor simulated prices 
+    def sim_comp_price(base, delta_pct):
+        if pd.isna(base): return "N/A"
+        val = base * (1 + delta_pct)
+        return f"${val:.2f}"
+
+    comps = tuple(f"{label}  {sim_comp_price(price_val, delta)}" for label, delta in COMPETITOR_OFFERS)
+    return (price_str, savings) + comps
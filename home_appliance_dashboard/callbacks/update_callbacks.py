@@ -1,196 +1,200 @@
-import numpy as np
-import pandas as pd
-from dash import Input, Output, State
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-
-# synthesize a 90-day price history around current price
-def synthesize_price_history(current_price, days=90, seed=None):
-    if seed is not None:
-        np.random.seed(seed)
-    base = float(current_price) if not pd.isna(current_price) else 20.0
-    dates = [datetime.today() - timedelta(days=(days - 1 - i)) for i in range(days)]
-    
-    trend = np.linspace(base * 1.05, base * 0.95, days)
-    noise = np.random.normal(0, base * 0.03, size=days)
-    prices = trend + noise
-    for _ in range(max(1, days // 30)):
-        idx = np.random.randint(0, days)
-        drop = prices[idx] * (0.12 + np.random.rand() * 0.2)
-        prices[idx: idx + 2] = prices[idx: idx + 2] - drop
-    prices = np.clip(prices, a_min=0.5, a_max=None)
-    return pd.DataFrame({'date': dates, 'price': prices})
-
-def normalize(x):
-    x = np.array(x, dtype=float)
-    if x.max() == x.min():
-        return np.zeros_like(x)
-    return (x - x.min()) / (x.max() - x.min())
-
-def register_callbacks(app, df):
-    @app.callback(
-        Output('product-selector', 'value'),
-        Input('top-search', 'value'),
-        prevent_initial_call=False
-    )
-    def search_to_selector(q):
-        if not q or str(q).strip() == "":
-            return None
-        q = q.strip()
-        # find best match by substring in title
-        mask = df['title'].str.contains(q, case=False, na=False)
-        if mask.any():
-            return df.loc[mask, 'asin'].iloc[0]
-        return None
-
-    #  update product info and all charts when product selected or product-selector changed
-    @app.callback(
-        Output('product-title', 'children'),
-        Output('product-sub', 'children'),
-        Output('product-price', 'children'),
-        Output('product-savings', 'children'),
-        Output('no-regret-badge', 'children'),
-        Output('price-line-chart', 'figure'),
-        Output('kpi-lowest', 'children'),
-        Output('kpi-avg', 'children'),
-        Output('kpi-vol', 'children'),
-        Output('kpi-return', 'children'),
-        Output('sentiment-histogram', 'figure'),
-        Output('risk-radar', 'figure'),
-        Output('comp-official', 'children'),
-        Output('comp-jd', 'children'),
-        Output('comp-suning', 'children'),
-        Output('comp-tmall', 'children'),
-        Input('product-selector', 'value'),
-        Input('top-search', 'value'),
-        State('product-selector', 'options'),
-        prevent_initial_call=False
-    )
-    def update_product(asin, top_search, options):
-        # Determine selected asin: priority selector->top_search match
-        selected_asin = asin
-        if (not selected_asin or pd.isna(selected_asin)) and top_search:
-            mask = df['title'].str.contains(str(top_search), case=False, na=False)
-            if mask.any():
-                selected_asin = df.loc[mask, 'asin'].iloc[0]
-
-        # choose first product
-        if not selected_asin:
-            row = df.iloc[0]
-        else:
-            row = df[df['asin'] == selected_asin]
-            if row.empty:
-                row = df.iloc[0]
-            else:
-                row = row.iloc[0]
-
-        # Basic product fields
-        title = row.get('title', 'Unknown Product')
-        brand = row.get('brand', '')
-        price_val = row.get('price/value', np.nan)
-        price_str = f"${price_val:.2f}" if not pd.isna(price_val) else "N/A"
-        # Sub text (SKU / rating)
-        stars = row.get('stars', '')
-        reviews = int(row.get('reviewsCount', 0)) if not pd.isna(row.get('reviewsCount', 0)) else 0
-        sub = f"Brand: {brand} · Rating: {stars} · Reviews: {reviews}"
-
-        # Simulate "was" price and savings if applicable (just sample)
-        was_price = price_val * (1.2) if not pd.isna(price_val) else np.nan
-        savings = f"Save ${was_price - price_val:.2f}" if (not pd.isna(price_val) and not pd.isna(was_price)) else ""
-
-        # Regret / lowest-in-year badge heuristic:
-        cat = row.get('category', '')
-        cat_prices = df[df['category'] == cat]['price/value'].dropna()
-        badge_text = ""
-        if not cat_prices.empty and not pd.isna(price_val):
-            threshold = cat_prices.quantile(0.10)
-            if price_val <= threshold:
-                badge_text = "Lowest in 1 year — No Regret!"
-            else:
-             
-                badge_text = ""
-
-        # Generate synthetic price history and build price line figure (Element B)
-        hist_df = synthesize_price_history(price_val, days=90, seed=hash(row['asin']) % 2**32)
-        price_fig = px.line(hist_df, x='date', y='price', title='', labels={'price': 'Price', 'date': 'Date'})
-        # mark sale points as markers where big dip occurred
-        dips = hist_df['price'].rolling(3).min() < (hist_df['price'].rolling(30, min_periods=1).mean() * 0.88)
-        price_fig.add_trace(go.Scatter(
-            x=hist_df.loc[dips, 'date'],
-            y=hist_df.loc[dips, 'price'],
-            mode='markers+text',
-            marker=dict(size=10, color='red'),
-            text=['SALE'] * dips.sum(),
-            textposition='top center',
-            name='Promotions'
-        ))
-
-        # KPIs (Element D) — compute over category
-        cat_df = df[df['category'] == cat]
-        lowest = cat_df['price/value'].min() if not cat_df.empty else np.nan
-        avg = cat_df['price/value'].mean() if not cat_df.empty else np.nan
-        vol = hist_df['price'].std()  
-        ret_rate = min(0.25, max(0.0, (1 - row.get('sentiment_score', 0)) * 0.2))  # proxy
-
-        # Sentiment histogram (Element E) using description polarity distribution of category
-        sent_series = cat_df['sentiment_score'].fillna(0)
-        sent_fig = px.bar(
-            x=['Positive','Neutral','Negative'],
-            y=[
-                (sent_series > 0.1).sum(),
-                ((sent_series >= -0.1) & (sent_series <= 0.1)).sum(),
-                (sent_series < -0.1).sum()
-            ],
-            labels={'x': 'Sentiment', 'y': 'Count'},
-            title=''
-        )
-
-        # Radar chart (Element F) compute normalized metrics for this product vs category
-        pv = hist_df['price'].std()  # product volatility
-        neg_sent_rate = (cat_df['sentiment_score'] < -0.1).mean() if not cat_df.empty else 0
-        low_rating = max(0, (5.0 - float(row.get('stars', 5))) / 5.0)
-        high_reviews_norm = (row.get('reviewsCount', 0) / (cat_df['reviewsCount'].max() if not cat_df.empty else 1))
-        metrics = [pv, neg_sent_rate, low_rating, high_reviews_norm, ret_rate]
-        normed = normalize(metrics)
-        categories = ['Price Volatility', 'Negative Sentiment', 'Low Ratings', 'High Reviews', 'Return/Complaint']
-
-        radar_fig = go.Figure()
-        radar_fig.add_trace(go.Scatterpolar(r=normed, theta=categories, fill='toself', name='Risk Radar'))
-        radar_fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 1])), showlegend=False)
-
-        # Competitor simulated prices 
-        def sim_comp_price(base, delta_pct):
-            if pd.isna(base): return "N/A"
-            val = base * (1 + delta_pct)
-            return f"${val:.2f}"
-
-        comp_official = f"Official Website  {sim_comp_price(price_val, -0.05)}"
-        comp_jd = f"JD.com  {sim_comp_price(price_val, 0.07)}"
-        comp_suning = f"Suning  {sim_comp_price(price_val, 0.25)}"
-        comp_tmall = f"Tmall Official  {sim_comp_price(price_val, 0.25)}"
-
-        # Format KPI strings
-        kpi_low_s = f"${lowest:.2f}" if not pd.isna(lowest) else "N/A"
-        kpi_avg_s = f"${avg:.2f}" if not pd.isna(avg) else "N/A"
-        kpi_vol_s = f"{vol:.2f}"
-        kpi_ret_s = f"{int(ret_rate * 100)}%"
-
-        return (
-            title,
-            sub,
-            price_str,
-            savings,
-            badge_text,
-            price_fig,
-            kpi_low_s,
-            kpi_avg_s,
-            kpi_vol_s,
-            kpi_ret_s,
-            sent_fig,
-            radar_fig,
-            comp_official,
-            comp_jd,
-            comp_suning,
-            comp_tmall
-        )
+from dash import ClientsideFunction, Input, Output, State, no_update
+from dash.exceptions import PreventUpdate
+from modules.catalog_holder import CatalogHolder
+from modules.data_service import CatalogNotReady, DataService
+from modules.layout import product_option
+from utils.constants import (CLIENTSIDE_FORMATTING, DROPDOWN_PAGE_SIZE, PRODUCT_CACHE_SERIALIZE,
+                             PRODUCT_CACHE_SIZE)
+from utils.profiling import register_stats, span
+
+def renderer(name, serialize=PRODUCT_CACHE_SERIALIZE):
+    # callbacks/renderers.py imports plotly and pandas, so it loads on the first render
+    from callbacks import renderers
+    render = getattr(renderers, name)
+    return renderers.serialized(render) if serialize else render
+
+def register_callbacks(app, df, cache_size=PRODUCT_CACHE_SIZE, service=None):
+    # df may be a CatalogHolder whose catalog is hot-reloaded (modules/ingestion.py) or still
+    # loading (modules/startup.py). Callbacks get their data from `service`
+    # (modules/data_service.py, a DataService over the holder by default), which reads
+    # holder.current so a swap takes effect on the next request.
+    if isinstance(df, CatalogHolder):
+        holder = df
+    else:
+        from modules.catalog import Catalog
+        holder = CatalogHolder(Catalog.build(df))
+    if service is None:
+        service = DataService(holder, cache_size=cache_size)
+
+    def call(coro):
+        # no update at all until the first catalog is loaded
+        try:
+            return service.call(coro)
+        except CatalogNotReady:
+            raise PreventUpdate
+
+    def catalog_stats():
+        catalog = holder.current
+        if catalog is None:
+            return {'loaded': False}
+        return {'loaded': True, 'version': catalog.version, 'rows': len(catalog.df)}
+    # served by the metrics endpoint (utils/profiling.py)
+    register_stats('product_cache', service.cache.stats)
+    register_stats('search_cache', lambda: holder.current.search_index.cache_stats() if holder.ready else {})
+    register_stats('catalog', catalog_stats)
+    register_stats('data_service', service.stats)
+    # figures drawn in the service's processes come back as JSON dicts
+    serialize = PRODUCT_CACHE_SERIALIZE or bool(service.processes)
+
+    def cached(part, asin, render):
+        # callback.<part> times every call including the wait for the service; render.<part>
+        # only cache misses. The service reads the catalog once per request, so a reload
+        # swapping in a new one mid-request does not mix two versions.
+        with span(f"callback.{part}"):
+            return call(service.render(part, asin, renderer(render, serialize)))
+
+    # the layout shell is served before the catalog is loaded; this poll flips catalog-ready
+    # (and stops itself) once it is, which triggers the first resolve and the dropdown page
+    @app.callback(
+        Output('catalog-ready', 'data'),
+        Output('startup-poll', 'disabled'),
+        Output('startup-status', 'children'),
+        Input('startup-poll', 'n_intervals'),
+        prevent_initial_call=False
+    )
+    def poll_catalog_ready(n_intervals):
+        if not holder.ready:
+            return no_update, False, "Loading catalog..."
+        return True, True, ""
+
+    @app.callback(
+        Output('product-selector', 'value'),
+        Input('top-search', 'value'),
+        prevent_initial_call=False
+    )
+    def search_to_selector(q):
+        if not q or str(q).strip() == "":
+            return None
+        # best ranked match over title, brand and category
+        with span('callback.search_to_selector'):
+            hits = call(service.search(q, k=1))
+        return hits[0] if hits else None
+
+    async def option_rows(search_value, value):
+        if search_value:
+            with span('search.dropdown'):
+                asins = await service.search(search_value, k=DROPDOWN_PAGE_SIZE)
+        else:
+            asins = await service.list_products(DROPDOWN_PAGE_SIZE)
+        # the selected product must stay among the options or the dropdown shows it blank
+        if value and value not in asins:
+            asins = [value] + asins[:DROPDOWN_PAGE_SIZE - 1]
+        return await service.get_products(asins)
+
+    # dropdown options come from the search index, one page at a time
+    @app.callback(
+        Output('product-selector', 'options'),
+        Input('product-selector', 'search_value'),
+        Input('product-selector', 'value'),
+        Input('catalog-ready', 'data'),
+        prevent_initial_call=True
+    )
+    def load_product_options(search_value, value, ready):
+        rows = call(option_rows(search_value, value))
+        return [product_option(row['title'], row['asin'], row.get('brand', ''), row.get('category', ''))
+                for row in rows]
+
+    # resolve the product once; every panel below updates from this store on its own
+    @app.callback(
+        Output('resolved-asin', 'data'),
+        Input('product-selector', 'value'),
+        Input('top-search', 'value'),
+        Input('catalog-ready', 'data'),
+        State('resolved-asin', 'data'),
+        prevent_initial_call=False
+    )
+    def resolve_asin(asin, top_search, ready, current):
+        # Determine selected asin: priority selector->top_search match, falling back to the
+        # first product when nothing matches
+        resolved = call(service.resolve(asin, top_search))
+        # same product: skip every downstream callback
+        return no_update if resolved == current else resolved
+
+    @app.callback(
+        Output('product-title', 'children'),
+        Output('product-sub', 'children'),
+        Output('no-regret-badge', 'children'),
+        Input('resolved-asin', 'data'),
+        prevent_initial_call=True
+    )
+    def update_header(asin):
+        return cached('header', asin, 'render_header')
+
+    @app.callback(
+        Output('price-line-chart', 'figure'),
+        Input('resolved-asin', 'data'),
+        prevent_initial_call=True
+    )
+    def update_price_chart(asin):
+        return cached('price-chart', asin, 'render_price_chart')
+
+    @app.callback(
+        Output('kpi-lowest', 'children'),
+        Output('kpi-avg', 'children'),
+        Output('kpi-vol', 'children'),
+        Output('kpi-return', 'children'),
+        Input('resolved-asin', 'data'),
+        prevent_initial_call=True
+    )
+    def update_kpis(asin):
+        return cached('kpis', asin, 'render_kpis')
+
+    @app.callback(
+        Output('sentiment-histogram', 'figure'),
+        Input('resolved-asin', 'data'),
+        prevent_initial_call=True
+    )
+    def update_topics(asin):
+        return cached('topics', asin, 'render_topics')
+
+    @app.callback(
+        Output('risk-radar', 'figure'),
+        Input('resolved-asin', 'data'),
+        prevent_initial_call=True
+    )
+    def update_radar(asin):
+        return cached('radar', asin, 'render_radar')
+
+    price_outputs = [
+        Output('product-price', 'children'),
+        Output('product-savings', 'children'),
+        Output('comp-official', 'children'),
+        Output('comp-jd', 'children'),
+        Output('comp-suning', 'children'),
+        Output('comp-tmall', 'children'),
+    ]
+    if CLIENTSIDE_FORMATTING:
+        # ship a tiny payload and let the browser do the arithmetic
+        @app.callback(
+            Output('product-payload', 'data'),
+            Input('resolved-asin', 'data'),
+            prevent_initial_call=True
+        )
+        def update_payload(asin):
+            return call(service.render('payload', asin, renderer('render_payload', serialize)))
+
+        app.clientside_callback(
+            ClientsideFunction(namespace='dashboard', function_name='format_prices'),
+            *price_outputs,
+            Input('product-payload', 'data'),
+            State('competitor-offers', 'data'),
+            prevent_initial_call=True
+        )
+    else:
+        @app.callback(
+            *price_outputs,
+            Input('resolved-asin', 'data'),
+            prevent_initial_call=True
+        )
+        def update_prices(asin):
+            return cached('prices', asin, 'render_prices')
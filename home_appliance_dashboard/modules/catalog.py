@@ -0,0 +1,129 @@
+import numpy as np
+
+from modules.category_stats import EMPTY_CATEGORY_STATS, build_category_stats, update_category_stats
+from modules.category_tree import CategoryTree
+from modules.data_processing import dataset_version
+from modules.price_history import synthesize_price_histories
+from modules.price_store import PriceStore
+from modules.product_index import ProductIndex, asin_lookup_for
+from modules.regret_model import load_or_train, with_regret_model
+from modules.regret_prediction import with_risk
+from modules.search_index import OVERLAY_MAX, SEARCH_FIELDS, SearchIndex
+from utils.constants import PRICE_STORE_DIR, REGRET_MODEL_PATH
+
+
+class Catalog:
+    # Everything the callbacks read for one version of the data. A reload builds a new
+    # Catalog (reusing what it can from the previous one) and swaps it into a CatalogHolder.
+    def __init__(self, df, version, category_stats, product_index, search_index, price_store, history_volatility,
+                 regret_model=None):
+        self.df = df
+        self.version = version
+        self.category_stats = category_stats
+        self.product_index = product_index
+        self.search_index = search_index
+        self.price_store = price_store
+        self.history_volatility = history_volatility
+        self.regret_model = regret_model
+        # breadcrumb hierarchy; level aggregates are built on first use per version
+        self.category_tree = CategoryTree.from_breadcrumbs(df['breadCrumbs']) if 'breadCrumbs' in df else None
+        self._level_stats = {}
+
+    @classmethod
+    def build(cls, df, price_store_dir=PRICE_STORE_DIR, regret_model_path=REGRET_MODEL_PATH):
+        version = dataset_version(df)
+        # mapped from the dataset snapshot when it was saved there for this version
+        search_index = SearchIndex.for_frame(df, version)
+        lookup = asin_lookup_for(df, version)
+        # stored 90-day histories with rolling min/mean and dip flags precomputed
+        price_store = PriceStore.open(price_store_dir, df)
+        history_volatility = price_store.volatility()
+        category_stats = build_category_stats(df)
+        # radar metrics, regret score and badge flag for every product, as columns
+        df = with_risk(df, history_volatility[price_store.rows_of(df['asin'])], category_stats)
+        # the fitted model replaces the heuristic no_regret flag
+        regret_model = load_or_train(df, price_store, category_stats, regret_model_path) if regret_model_path else None
+        if regret_model is not None:
+            df = with_regret_model(df, regret_model, category_stats)
+        return cls(
+            df,
+            version,
+            category_stats,
+            ProductIndex(df, lookup),
+            search_index,
+            price_store,
+            history_volatility,
+            regret_model,
+        )
+
+    def category_of(self, asin):
+        row = self.product_index.get(asin)
+        return None if row is None else row.get('category')
+
+    def level_stats(self, level):
+        # aggregates for every category node at `level` (0 = department), keyed by node id
+        stats = self._level_stats.get(level)
+        if stats is None:
+            stats = self._level_stats[level] = self.category_tree.level_stats(self.df, level)
+        return stats
+
+    def stats_at(self, asin, level):
+        # aggregates of the product's ancestor category at `level`
+        position = self.product_index.position_of(asin)
+        if position is None or self.category_tree is None:
+            return EMPTY_CATEGORY_STATS
+        node = self.category_tree.ancestor_of(position, level)
+        return self.level_stats(level).get(node, EMPTY_CATEGORY_STATS)
+
+    def volatility_of(self, asin):
+        return self.history_volatility[self.price_store.row_of(asin)]
+
+    def updated(self, df, changed, removed, categories):
+        # Next version after `changed` ASINs were added/edited and `removed` ones dropped;
+        # `categories` are the categories those rows belonged to before or after the change.
+        category_stats = update_category_stats(self.category_stats, df, categories)
+        listed = df[df['asin'].notna()].drop_duplicates('asin').set_index('asin')['price/value']
+        edited = [a for a in dict.fromkeys(changed) if a in listed.index]
+        new_asins = [a for a in edited if a not in self.price_store]
+        # nothing this catalog holds is modified: requests may still be reading it
+        price_store = self.price_store
+        if new_asins:
+            # new products get a history; the store only ever grows
+            prices = listed.loc[new_asins].to_numpy()
+            price_store = price_store.add_products(new_asins, synthesize_price_histories(prices, new_asins, price_store.days), prices)
+        # edited prices become today's price point (a reload on a later day first appends the
+        # days in between at the catalog's prices)
+        price_store = price_store.synced(listed.index.to_numpy(), listed.to_numpy())
+        if price_store.days != self.price_store.days:
+            history_volatility = price_store.volatility()
+        else:
+            # only the added and edited products' histories changed
+            history_volatility = np.concatenate([self.history_volatility, np.empty(len(price_store.asins) - len(self.history_volatility))])
+            history_volatility[price_store.rows_of(edited)] = price_store.volatility(edited)
+        # category aggregates feed some metrics, so the risk columns are recomputed as a whole
+        df = with_risk(df, history_volatility[price_store.rows_of(df['asin'])], category_stats)
+        if self.regret_model is not None:
+            df = with_regret_model(df, self.regret_model, category_stats)
+
+        product_index = ProductIndex(df)
+        search_index = self.search_index.copy()
+        for asin in set(changed) | set(removed):
+            search_index.remove(asin)
+        for asin in changed:
+            row = product_index.get(asin)
+            search_index.add(asin, *(row.get(f) for f in SEARCH_FIELDS))
+        if search_index.overlay_size() > OVERLAY_MAX:
+            # fold the overlay back into packed postings
+            search_index = SearchIndex.from_frame(df)
+
+        return Catalog(
+            df,
+            dataset_version(df),
+            category_stats,
+            product_index,
+            search_index,
+            price_store,
+            history_volatility,
+            self.regret_model,
+        )
+
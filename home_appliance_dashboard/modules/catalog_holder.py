@@ -0,0 +1,41 @@
+import threading
+
+
+class CatalogHolder:
+    # The current Catalog, swapped atomically; subscribers are told which ASINs and
+    # categories changed so they can invalidate only what depends on them. Starts empty
+    # when the catalog is loaded in the background (modules/startup.py): until the first
+    # swap `current` is None and `ready` is False.
+    def __init__(self, catalog=None):
+        self._catalog = catalog
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._ready = threading.Event()
+        if catalog is not None:
+            self._ready.set()
+
+    @property
+    def current(self):
+        return self._catalog
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        # block until the first catalog is in place; False on timeout
+        return self._ready.wait(timeout)
+
+    def subscribe(self, callback):
+        # callback(old, new, asins, categories)
+        self._subscribers.append(callback)
+
+    def swap(self, catalog, asins=(), categories=()):
+        with self._lock:
+            old, self._catalog = self._catalog, catalog
+        self._ready.set()
+        # nothing was served from an empty holder, so there is nothing to invalidate
+        if old is not None:
+            for callback in self._subscribers:
+                callback(old, catalog, set(asins), set(categories))
+        return old
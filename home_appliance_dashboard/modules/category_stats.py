@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+from modules.sentiment_analysis import KEYWORD_SEPARATOR
+
+# sentiment buckets used by the "Review Topics" chart and the radar
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+# returned for a category that is not in the table (mirrors the old empty-filter fallbacks)
+EMPTY_CATEGORY_STATS = {
+    'count': 0,
+    'price_p10': np.nan,
+    'price_min': np.nan,
+    'price_mean': np.nan,
+    'reviews_max': 1,
+    'negative_rate': 0.0,
+    'sentiment_counts': (0, 0, 0),
+    'topic_counts': {},
+}
+
+
+def _topic_counts(df, keys):
+    # {category: {complaint keyword: products mentioning it}}, most mentioned first; counted
+    # per distinct keyword combination, of which there are few
+    if 'complaint_keywords' not in df:
+        return {}
+    pairs = pd.DataFrame({'category': keys, 'keywords': df['complaint_keywords']})
+    sizes = pairs.groupby(['category', 'keywords'], sort=False, dropna=False, observed=True).size()
+    counts = {}
+    for (cat, keywords), n in sizes.items():
+        if isinstance(keywords, str) and keywords:
+            topics = counts.setdefault(cat, {})
+            for keyword in keywords.split(KEYWORD_SEPARATOR):
+                topics[keyword] = topics.get(keyword, 0) + int(n)
+    return {cat: dict(sorted(topics.items(), key=lambda kv: (-kv[1], kv[0]))) for cat, topics in counts.items()}
+
+
+def _aggregate(df, keys=None):
+    sent = df['sentiment_score'].fillna(0)
+    frame = pd.DataFrame({
+        'category': df['category'] if keys is None else keys,
+        'price': df['price/value'],
+        'reviews': df['reviewsCount'],
+        'negative_raw': df['sentiment_score'] < NEGATIVE_THRESHOLD,
+        'positive': sent > POSITIVE_THRESHOLD,
+        'neutral': (sent >= NEGATIVE_THRESHOLD) & (sent <= POSITIVE_THRESHOLD),
+        'negative': sent < NEGATIVE_THRESHOLD,
+    })
+    grouped = frame.groupby('category', sort=False, dropna=False, observed=True)
+
+    agg = pd.DataFrame({
+        'count': grouped.size(),
+        'price_p10': grouped['price'].quantile(0.10),
+        'price_min': grouped['price'].min(),
+        'price_mean': grouped['price'].mean(),
+        'reviews_max': grouped['reviews'].max(),
+        'negative_rate': grouped['negative_raw'].mean(),
+        'positive': grouped['positive'].sum(),
+        'neutral': grouped['neutral'].sum(),
+        'negative': grouped['negative'].sum(),
+    })
+    topics = _topic_counts(df, frame['category'])
+
+    stats = {}
+    for cat, r in agg.iterrows():
+        stats[cat] = {
+            'count': int(r['count']),
+            'price_p10': float(r['price_p10']),
+            'price_min': float(r['price_min']),
+            'price_mean': float(r['price_mean']),
+            'reviews_max': r['reviews_max'],
+            'negative_rate': float(r['negative_rate']),
+            'sentiment_counts': (int(r['positive']), int(r['neutral']), int(r['negative'])),
+            'topic_counts': topics.get(cat, {}),
+        }
+    return stats
+
+
+def build_category_stats(df, keys=None):
+    # one pass over the catalog; callbacks then look categories up by key.
+    # keys (one per row) groups by something else, e.g. CategoryTree node ids at some level
+    return _aggregate(df, keys)
+
+
+def update_category_stats(stats, df, categories):
+    # recompute only the given categories after the data changed, leaving the rest untouched
+    categories = set(categories)
+    updated = {cat: s for cat, s in stats.items() if cat not in categories}
+    changed = df[df['category'].isin(categories)]
+    if not changed.empty:
+        updated.update(_aggregate(changed))
+    return updated
+
+
+def get_category_stats(stats, category):
+    return stats.get(category, EMPTY_CATEGORY_STATS)
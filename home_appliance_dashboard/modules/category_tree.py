@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from modules.category_stats import build_category_stats
+
+BREADCRUMB_SEP = '›'
+# depth 0 is the department ("Home & Kitchen"); the leaf is what extract_category keeps
+ROOT_LEVEL = 0
+
+
+def _distinct_paths(breadcrumbs):
+    # codes per row + each distinct path as text (a missing path reads as 'nan', like str(x) did)
+    codes, uniques = pd.factorize(breadcrumbs, use_na_sentinel=False)
+    return codes, pd.Series(np.asarray(uniques, dtype=object)).map(str)
+
+
+def breadcrumb_leaves(breadcrumbs):
+    # last segment of every path; string ops run once per distinct path, then are broadcast by code
+    codes, paths = _distinct_paths(breadcrumbs)
+    leaves = paths.str.rsplit(BREADCRUMB_SEP, n=1).str[-1].str.strip().to_numpy()
+    return pd.Series(leaves[codes], index=breadcrumbs.index, dtype='str')
+
+
+class CategoryTree:
+    # Breadcrumb paths parsed once: node ids with parent pointers and depths, product -> leaf
+    # node, and node -> ancestor at every depth. Grouping products at any level is then an
+    # array lookup instead of string filtering.
+    def __init__(self, names, parents, depths, product_leaf, ids):
+        self.names = names
+        self.parents = parents
+        self.depths = depths
+        self.product_leaf = product_leaf
+        self._ids = ids
+        self.ancestors = self._ancestor_matrix()
+
+    @classmethod
+    def from_breadcrumbs(cls, breadcrumbs):
+        codes, paths = _distinct_paths(breadcrumbs)
+        segments = paths.str.split(BREADCRUMB_SEP).map(lambda parts: [p.strip() for p in parts])
+        ids, names, parents, depths = {}, [], [], []
+        path_leaf = np.empty(len(segments), dtype=np.int32)
+        for j, parts in enumerate(segments):
+            parent = -1
+            for depth in range(len(parts)):
+                key = tuple(parts[:depth + 1])
+                node = ids.get(key)
+                if node is None:
+                    node = ids[key] = len(names)
+                    names.append(parts[depth])
+                    parents.append(parent)
+                    depths.append(depth)
+                parent = node
+            path_leaf[j] = parent
+        return cls(names, np.asarray(parents, dtype=np.int32), np.asarray(depths, dtype=np.int16),
+                   path_leaf[codes], ids)
+
+    def _ancestor_matrix(self):
+        # row = node, column d = its ancestor at depth d (itself at its own depth), -1 past it.
+        # Parents always get smaller ids than their children, so one pass in id order suffices.
+        n = len(self.names)
+        matrix = np.full((n, self.max_depth + 1), -1, dtype=np.int32)
+        for node in range(n):
+            parent = self.parents[node]
+            if parent >= 0:
+                matrix[node] = matrix[parent]
+            matrix[node, self.depths[node]] = node
+        return matrix
+
+    @property
+    def max_depth(self):
+        return int(self.depths.max()) if len(self.depths) else 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def node_id(self, *path):
+        # node for a path of segment names from the root, or None
+        return self._ids.get(tuple(path))
+
+    def path(self, node):
+        parts = []
+        while node >= 0:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        return parts[::-1]
+
+    def product_ancestors(self, level=ROOT_LEVEL):
+        # node id per product at `level`; -1 where the product's path is shallower
+        if level > self.max_depth:
+            return np.full(len(self.product_leaf), -1, dtype=np.int32)
+        return self.ancestors[self.product_leaf, level]
+
+    def ancestor_of(self, position, level):
+        # one product's node at `level`, or -1
+        if level > self.max_depth:
+            return -1
+        return int(self.ancestors[self.product_leaf[position], level])
+
+    def level_stats(self, df, level):
+        # category_stats-style aggregates keyed by node id for every node at `level`
+        keys = self.product_ancestors(level)
+        stats = build_category_stats(df, keys=keys)
+        stats.pop(-1, None)
+        return stats
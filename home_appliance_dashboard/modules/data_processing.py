@@ -1,19 +1,237 @@
-import pandas as pd
-from textblob import TextBlob
-
-def load_and_preprocess_data(file_path):
-    df = pd.read_csv(file_path)
-    
-    # Price as float
-    df['price/value'] = pd.to_numeric(df['price/value'], errors='coerce')
-    
-    # Sentiment score
-    df['sentiment_score'] = df['description'].fillna("").apply(lambda x: TextBlob(str(x)).sentiment.polarity)
-    
-    # Category extraction
-    df['category'] = df['breadCrumbs'].apply(lambda x: str(x).split('›')[-1].strip())
-    
-    # Price volatility (rolling std as placeholder)
-    df['price_volatility'] = df['price/value'].rolling(5, min_periods=1).std()
-    
-    return df
+import hashlib
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from modules.category_tree import breadcrumb_leaves
+from modules.sentiment_analysis import SCORER_VERSION, complaint_keywords, default_sentiment_cache, score_texts
+from modules.snapshot import (load_snapshot, remove_stale_snapshots, save_snapshot, snapshot_path,
+                              source_fingerprint)
+from modules.text_store import TextStoreWriter
+from utils.profiling import span
+from utils.helpers import process_pool
+from utils.constants import COMPACT_CATALOG, CSV_CHUNK_ROWS, REVIEW_TEXT_COLUMN, STREAM_MIN_BYTES, TEXT_SPILL_DIR
+
+logger = logging.getLogger(__name__)
+
+# columns whose content the dashboard renders; dataset_version changes when any of them does
+VERSION_COLUMNS = ['asin', 'title', 'brand', 'stars', 'reviewsCount', 'price/value',
+                   'category', 'sentiment_score', 'price_volatility', 'complaint_keywords']
+# compact_catalog layout: repeated strings become categoricals (breadcrumb paths are interned
+# this way too), long text moves to a TextStore and url, which nothing renders, is dropped
+CATEGORICAL_COLUMNS = ['brand', 'price/currency', 'breadCrumbs', 'category', 'complaint_keywords']
+# displayed values (prices, ratings) stay float64: float32 is off in the last digits
+FLOAT32_COLUMNS = ['sentiment_score', 'price_volatility']
+INT32_COLUMNS = ['reviewsCount']
+LAZY_TEXT_COLUMNS = ['description', REVIEW_TEXT_COLUMN]
+# source columns the streaming loader reads
+STREAM_COLUMNS = ['title', 'brand', 'description', 'stars', 'reviewsCount', 'price/currency',
+                  'price/value', 'breadCrumbs', 'asin', REVIEW_TEXT_COLUMN]
+# bump when the preprocessed columns or compact_catalog's dtypes change, so snapshots in the
+# old layout are rebuilt
+COMPACT_LAYOUT = 4
+# snapshots of compact and full frames must not be mistaken for each other
+SNAPSHOT_TAG = f"{SCORER_VERSION}-c{COMPACT_LAYOUT}" + ('-compact' if COMPACT_CATALOG else '')
+# rolling window of compute_volatility; the last WINDOW - 1 prices carry over between chunks
+VOLATILITY_WINDOW = 5
+
+
+def coerce_prices(df):
+    # Price as float
+    df['price/value'] = pd.to_numeric(df['price/value'], errors='coerce')
+    return df
+
+
+def score_sentiment(df, sentiment_workers=None, progress=None, pool=None):
+    # Sentiment score (batched over a process pool, empty/duplicate/cached descriptions skipped)
+    df['sentiment_score'] = score_texts(df['description'].tolist(), workers=sentiment_workers,
+                                        progress=progress, cache=default_sentiment_cache(), pool=pool)
+    return df
+
+
+def tag_complaints(df):
+    # complaint keywords in each product's review text, counted per category by the "Review
+    # Topics" panel; a catalog without review text gets no complaint_keywords column
+    if REVIEW_TEXT_COLUMN in df:
+        df['complaint_keywords'] = complaint_keywords(df[REVIEW_TEXT_COLUMN])
+    return df
+
+
+def extract_category(df):
+    # Category extraction: leaf of the breadcrumb path, parsed once per distinct path
+    df['category'] = breadcrumb_leaves(df['breadCrumbs'])
+    return df
+
+
+def compute_volatility(df):
+    # Price volatility (rolling std as placeholder)
+    df['price_volatility'] = df['price/value'].rolling(VOLATILITY_WINDOW, min_periods=1).std()
+    return df
+
+
+def preprocess(df, sentiment_workers=None, progress=None):
+    with span('pipeline.price_coercion'):
+        coerce_prices(df)
+    with span('pipeline.sentiment'):
+        score_sentiment(df, sentiment_workers, progress)
+    with span('pipeline.complaints'):
+        tag_complaints(df)
+    with span('pipeline.category'):
+        extract_category(df)
+    with span('pipeline.volatility'):
+        compute_volatility(df)
+    return df
+
+
+def load_and_preprocess_data(file_path, sentiment_workers=None, progress=None):
+    if os.path.getsize(file_path) >= STREAM_MIN_BYTES:
+        return load_streaming(file_path, sentiment_workers=sentiment_workers, progress=progress, compact=COMPACT_CATALOG)
+    with span('pipeline.parse'):
+        df = pd.read_csv(file_path)
+    return preprocess(df, sentiment_workers, progress)
+
+
+def text_spill_dir(file_path):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(TEXT_SPILL_DIR, f"{stem}-{source_fingerprint(file_path)}")
+
+
+def text_spill_path(file_path, column):
+    return os.path.join(text_spill_dir(file_path), column)
+
+
+def compact_catalog(df, text_dir=None):
+    # Smallest in-memory form of a preprocessed frame: categorical codes, int32 review counts,
+    # float32 scores. LAZY_TEXT_COLUMNS are written to TextStores under text_dir
+    # (when given) before being dropped; url is dropped as nothing renders it.
+    out = df.drop(columns=[c for c in LAZY_TEXT_COLUMNS + ['url'] if c in df.columns])
+    if text_dir is not None:
+        for col in LAZY_TEXT_COLUMNS:
+            if col in df.columns:
+                writer = TextStoreWriter(os.path.join(text_dir, col))
+                writer.extend(df[col])
+                writer.close()
+    for col in out.columns:
+        if col in CATEGORICAL_COLUMNS:
+            out[col] = out[col].astype('category')
+        elif col in FLOAT32_COLUMNS:
+            out[col] = pd.to_numeric(out[col], errors='coerce').astype(np.float32)
+        elif col in INT32_COLUMNS:
+            # a missing review count renders as 0 reviews anyway
+            out[col] = pd.to_numeric(out[col], errors='coerce').fillna(0).astype(np.int32)
+    return out
+
+
+def memory_report(df):
+    # bytes per column (strings counted in full), to size workers for large catalogs
+    usage = df.memory_usage(deep=True, index=False)
+    rows = max(len(df), 1)
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': usage,
+        'bytes_per_row': usage / rows,
+        'share': usage / max(usage.sum(), 1),
+    })
+    report.loc['total'] = ['', usage.sum(), usage.sum() / rows, 1.0]
+    return report
+
+
+def _stream_chunks(file_path, chunksize, workers, pool, progress, spill, compact):
+    tail = pd.Series(dtype=float)
+    rows = 0
+    usecols = (lambda c: c in STREAM_COLUMNS) if compact else None
+    reader = pd.read_csv(file_path, usecols=usecols, chunksize=chunksize)
+    for chunk in reader:
+        with span('pipeline.price_coercion'):
+            coerce_prices(chunk)
+        with span('pipeline.sentiment'):
+            score_sentiment(chunk, workers, pool=pool)
+        with span('pipeline.complaints'):
+            tag_complaints(chunk)
+        with span('pipeline.category'):
+            extract_category(chunk)
+        with span('pipeline.volatility'):
+            # prepend the previous chunk's tail so the rolling window matches a single pass
+            prices = pd.concat([tail, chunk['price/value']], ignore_index=True)
+            volatility = prices.rolling(VOLATILITY_WINDOW, min_periods=1).std().to_numpy()
+            chunk['price_volatility'] = volatility[len(tail):]
+            tail = prices.iloc[-(VOLATILITY_WINDOW - 1):]
+        if spill is not None:
+            spill.extend(chunk['description'])
+        rows += len(chunk)
+        if progress:
+            progress(rows, None)
+        yield compact_catalog(chunk) if compact else chunk
+
+
+def load_streaming(file_path, chunksize=CSV_CHUNK_ROWS, sentiment_workers=None, progress=None, spill_text=True,
+                   compact=True):
+    # Same pipeline as load_and_preprocess_data, one chunk at a time, so peak memory follows the
+    # chunk size rather than the file size. With compact, every chunk goes through
+    # compact_catalog and descriptions go to a TextStore (text_spill_path) as they are read, or
+    # are dropped; otherwise the result is the full preprocessed frame.
+    # progress(rows_done, None) is called after every chunk.
+    spill = TextStoreWriter(text_spill_path(file_path, 'description')) if spill_text and compact else None
+    workers = sentiment_workers or os.cpu_count() or 1
+    # one pool for the whole file: worker processes (and their TextBlob import) start once
+    pool = process_pool(workers) if workers > 1 else None
+    try:
+        chunks = list(_stream_chunks(file_path, chunksize, workers, pool, progress, spill, compact))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if spill is not None:
+        spill.close()
+    if not chunks:
+        return pd.read_csv(file_path, nrows=0)
+    if not compact:
+        return pd.concat(chunks, ignore_index=True)
+    columns = chunks[0].columns
+    categorical = [c for c in CATEGORICAL_COLUMNS if c in columns]
+    df = pd.concat([c.drop(columns=categorical) for c in chunks], ignore_index=True)
+    for col in categorical:
+        # union of per-chunk categories, in order of appearance (plain concat would fall back to
+        # object). A chunk where the column is all missing reads as float and gets empty float
+        # categories, which union_categoricals refuses to mix, so every chunk is recoded instead.
+        parts = [c[col] for c in chunks]
+        known = [p.cat.categories for p in parts if len(p.cat.categories)]
+        dtype = pd.CategoricalDtype(known[0].append(known[1:]).unique()) if known else parts[0].dtype
+        df[col] = pd.concat([p.astype(dtype) for p in parts], ignore_index=True)
+    return df[columns]
+
+
+def dataset_version(df):
+    cols = [c for c in VERSION_COLUMNS if c in df.columns]
+    hashed = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    return hashlib.blake2b(hashed.tobytes(), digest_size=8).hexdigest()
+
+
+def _load_compact(file_path, **kwargs):
+    df = load_and_preprocess_data(file_path, **kwargs)
+    return compact_catalog(df, text_dir=text_spill_dir(file_path)) if COMPACT_CATALOG else df
+
+
+def load_dataset(file_path, use_snapshot=True, **kwargs):
+    # Memory-maps the preprocessed snapshot when it matches the source CSV;
+    # otherwise runs the full pipeline and writes a fresh snapshot for the next start.
+    if not use_snapshot:
+        return _load_compact(file_path, **kwargs)
+    path = snapshot_path(file_path, extra=SNAPSHOT_TAG)
+    df = load_snapshot(path)
+    if df is not None:
+        return df
+    df = _load_compact(file_path, **kwargs)
+    try:
+        save_snapshot(df, path)
+        remove_stale_snapshots(path)
+    except OSError as exc:
+        logger.warning("could not write snapshot %s: %s", path, exc)
+    return df
+
+
+if __name__ == "__main__":
+    # prebuild the snapshot as a deploy step: python -m modules.data_processing data/amazon_kitchenware.csv
+    df = load_dataset(sys.argv[1] if len(sys.argv) > 1 else 'data/amazon_kitchenware.csv')
+    print(memory_report(df).to_string())
@@ -0,0 +1,251 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.constants import (DATA_SERVICE_PROCESSES, DATA_SERVICE_TIMEOUT, DATA_SERVICE_WORKERS,
+                             PRODUCT_CACHE_SIZE)
+from utils.helpers import process_pool
+from utils.lru_cache import LRUCache
+from utils.profiling import record, sampled_profile, span
+
+# rendered parts that read category aggregates, not just the product's own row
+CATEGORY_PARTS = {'header', 'kpis', 'topics', 'radar'}
+# rendered parts that read the price history or its volatility
+HISTORY_PARTS = {'price-chart', 'kpis', 'radar'}
+
+_MISSING = object()
+
+
+class CatalogNotReady(Exception):
+    # raised while the holder is still empty (background startup load)
+    pass
+
+
+class DataService:
+    # Async access to the current catalog for the callbacks. Coroutines run on the service's
+    # own event loop thread; rendering goes to a bounded thread pool (or, with `processes`, a
+    # process pool), and concurrent requests for the same (part, ASIN, data version) share one
+    # computation.
+    # Dash callbacks are synchronous: they go through call(), which blocks the request thread
+    # until the coroutine has finished on the loop.
+    def __init__(self, holder, workers=DATA_SERVICE_WORKERS, cache_size=PRODUCT_CACHE_SIZE,
+                 timeout=DATA_SERVICE_TIMEOUT, processes=DATA_SERVICE_PROCESSES):
+        self.holder = holder
+        self.workers = workers
+        if processes is None:
+            cpus = os.cpu_count() or 1
+            processes = cpus if cpus > 1 else 0
+        # with processes, renders must be picklable and return picklable output
+        # (callbacks/renderers.py serialized)
+        self.processes = processes
+        self.timeout = timeout
+        # rendered outputs per (part, ASIN, data version); the version changes whenever the data does
+        self.cache = LRUCache(cache_size)
+        self.coalesced = 0
+        self._inflight = {}
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._pool = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        holder.subscribe(self._migrate_cache)
+
+    def start(self):
+        # started on the first call() when not started explicitly; a forked worker inherits the
+        # parent's loop object but not its thread, so it starts its own
+        with self._start_lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._inflight = {}
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='data-service')
+                self._pool = process_pool(self.processes) if self.processes else None
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name='data-service-loop', daemon=True)
+                self._thread.start()
+                self._loop = loop
+                self._pid = os.getpid()
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=True)
+        if self._pool:
+            self._pool.shutdown(wait=True)
+        self._loop = self._thread = self._executor = self._pool = self._pid = None
+
+    def call(self, coro):
+        # run coro on the service loop and wait for its result (or TimeoutError after self.timeout)
+        if self._pid != os.getpid():
+            self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self):
+        return {'workers': self.workers, 'processes': self.processes, 'inflight': len(self._inflight),
+                'coalesced': self.coalesced}
+
+    def catalog(self):
+        catalog = self.holder.current
+        if catalog is None:
+            raise CatalogNotReady()
+        return catalog
+
+    def _migrate_cache(self, old, new, asins, categories):
+        # carry entries for untouched products over to the new version instead of dropping them all;
+        # a reload on a later day adds a price day to every product's history
+        new_day = old.price_store.days != new.price_store.days
+
+        def rekey(key):
+            part, asin, version = key
+            if version != old.version:
+                return key if version == new.version else None
+            if asin in asins or (part in CATEGORY_PARTS and old.category_of(asin) in categories):
+                return None
+            if new_day and part in HISTORY_PARTS:
+                return None
+            return part, asin, new.version
+        self.cache.rekey(rekey)
+
+    async def _run(self, fn, *args):
+        # off the event loop, at most `workers` at a time
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _coalesced(self, key, work, *args):
+        # one work(*args) coroutine per key in flight; later callers await the same future.
+        # _inflight is only touched from the loop thread, so it needs no lock.
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(work(*args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # a caller that times out does not cancel the work the others are waiting on
+        return await asyncio.shield(future)
+
+    async def get_product(self, asin):
+        # ProductRecord for asin, or None when it is not in the catalog
+        return self.catalog().product_index.get(asin)
+
+    async def get_products(self, asins):
+        # records of the known ASINs among asins, in order, from one catalog version
+        product_index = self.catalog().product_index
+        rows = [product_index.get(asin) for asin in asins]
+        return [row for row in rows if row is not None]
+
+    async def list_products(self, n):
+        # the first n products in catalog order (the dropdown's first page)
+        product_index = self.catalog().product_index
+        return [product_index.asin_at(i) for i in range(min(n, len(product_index)))]
+
+    async def resolve(self, asin, query=None):
+        # the ASIN to show: asin itself, else the best search match for query, else the default product
+        return await self._run(self._resolve, self.catalog(), asin, query)
+
+    @staticmethod
+    def _resolve(catalog, asin, query):
+        if not asin and query:
+            with span('search.resolve'):
+                asin = catalog.search_index.best(query)
+        row = catalog.product_index.lookup(asin)
+        return None if row is None else row['asin']
+
+    async def search(self, query, k=10):
+        # ranked in the pool like renders, so a long query does not hold up the loop
+        return await self._run(self.catalog().search_index.search, query, k)
+
+    async def get_category_stats(self, category, catalog=None):
+        # aggregates of `category` in catalog (the current one by default)
+        # imported here: the service is created at app import, before pandas is loaded
+        from modules.category_stats import get_category_stats
+        catalog = catalog or self.catalog()
+        return get_category_stats(catalog.category_stats, category)
+
+    async def get_history(self, asin, days=None, catalog=None):
+        # the product's last `days` (default: all) stored daily prices with rolling min/mean and
+        # dip flags, from catalog (the current one by default)
+        catalog = catalog or self.catalog()
+        args = (asin,) if days is None else (asin, days)
+        return await self._coalesced(('history', asin, days, catalog.version), self._run, catalog.price_store.last, *args)
+
+    async def _inputs(self, catalog, row, names):
+        # what a renderer reads besides the row (its `inputs`, see callbacks/renderers.py),
+        # all from the catalog version being rendered
+        from modules.price_history import HISTORY_DAYS
+        inputs = {}
+        if 'history' in names:
+            inputs['history'] = await self.get_history(row['asin'], HISTORY_DAYS, catalog)
+        if 'category_stats' in names:
+            inputs['category_stats'] = await self.get_category_stats(row.get('category', ''), catalog)
+        if 'volatility' in names:
+            inputs['volatility'] = catalog.volatility_of(row['asin'])
+        return inputs
+
+    async def render(self, part, asin, render):
+        # render(row, **inputs) for the product, cached per data version; render.<part> is timed
+        # (and sampled by the profiler) in the pool thread that runs it, or timed in the worker
+        # process and recorded here
+        catalog = self.catalog()
+        row = catalog.product_index.lookup(asin)
+        key = (part, row['asin'], catalog.version)
+        output = self.cache.get(key, _MISSING)
+        if output is _MISSING:
+            output = await self._coalesced(key, self._render, key, render, catalog, row)
+        return output
+
+    async def _render(self, key, render, catalog, row):
+        inputs = await self._inputs(catalog, row, getattr(render, 'inputs', ()))
+        if self._pool:
+            # the row goes over as a plain dict of its values
+            output, seconds = await asyncio.get_running_loop().run_in_executor(
+                self._pool, _draw_in_process, render, row.to_dict(), inputs)
+            record(f"render.{key[0]}", seconds)
+        else:
+            output = await self._run(self._draw, key[0], render, row, inputs)
+        self.cache.put(key, output)
+        return output
+
+    @staticmethod
+    def _draw(part, render, row, inputs):
+        with span(f"render.{part}"), sampled_profile(f"render.{part}"):
+            return render(row, **inputs)
+
+
+def _draw_in_process(render, row, inputs):
+    # runs in a DataService worker process -> (output, seconds)
+    start = time.perf_counter()
+    output = render(row, **inputs)
+    return output, time.perf_counter() - start
+
+
+class LocalDataService(DataService):
+    # In-process stand-in with the same API: no loop thread and no pool. call() drives each
+    # coroutine to completion in the calling thread and everything runs inline, without
+    # coalescing. Enough for tests and scripts.
+    def __init__(self, holder, cache_size=PRODUCT_CACHE_SIZE):
+        super().__init__(holder, cache_size=cache_size, processes=0)
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def call(self, coro):
+        return asyncio.run(coro)
+
+    async def _run(self, fn, *args):
+        return fn(*args)
+
+    async def _coalesced(self, key, work, *args):
+        return await work(*args)
@@ -0,0 +1,180 @@
+import glob
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from modules.data_processing import coerce_prices, compute_volatility, extract_category, tag_complaints
+from modules.sentiment_analysis import default_sentiment_cache, score_texts
+from modules.text_store import TextDtype
+from utils.constants import HOT_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# a known ASIN counts as changed when any of these differ
+# (sentiment_score stands in for description when the base was streamed without its text)
+COMPARE_COLUMNS = ['title', 'brand', 'description', 'stars', 'reviewsCount',
+                   'price/currency', 'price/value', 'breadCrumbs', 'url', 'sentiment_score', 'complaint_keywords']
+
+
+def _stat(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _by_asin(df, columns):
+    # one row per ASIN (first wins) with plain object values, for lookups and comparisons
+    first = df.drop_duplicates('asin')
+    return pd.DataFrame({c: first[c].astype(object).to_numpy() for c in columns if c in first.columns},
+                        index=first['asin'].astype(object).to_numpy())
+
+
+def _conform(rows, base):
+    # numeric columns in the base's dtypes (e.g. float32 from the streaming loader)
+    rows = rows.copy()
+    for col in rows.columns.intersection(base.columns):
+        dtype = base[col].dtype
+        if pd.api.types.is_integer_dtype(dtype):
+            rows[col] = pd.to_numeric(rows[col], errors='coerce').fillna(0).astype(dtype)
+        elif pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype):
+            rows[col] = rows[col].astype(dtype)
+    return rows
+
+
+def _same(a, b):
+    a, b = np.asarray(a, dtype=object), np.asarray(b, dtype=object)
+    return (a == b) | (pd.isna(a) & pd.isna(b))
+
+
+def prepare_rows(raw, base):
+    # Preprocess incoming raw rows; descriptions unchanged since `base` keep their score.
+    rows = raw.drop_duplicates('asin').reset_index(drop=True)
+    coerce_prices(rows)
+    tag_complaints(rows)
+    extract_category(rows)
+    old = _by_asin(base, ['description', 'sentiment_score'])
+    known = rows['asin'].isin(old.index).to_numpy()
+    prev = old.reindex(rows['asin'].astype(object))
+    if 'description' in prev:
+        reuse = known & _same(rows['description'], prev['description'])
+    else:
+        # text was not kept; the sentiment cache makes re-scoring unchanged text a lookup
+        reuse = np.zeros(len(rows), dtype=bool)
+
+    scores = np.zeros(len(rows))
+    scores[reuse] = prev['sentiment_score'].to_numpy(dtype=float)[reuse]
+    if (~reuse).any():
+        scores[~reuse] = score_texts(rows.loc[~reuse, 'description'].tolist(), cache=default_sentiment_cache())
+    rows['sentiment_score'] = scores
+    return rows
+
+
+def diff_rows(rows, base):
+    # ASINs in `rows` that are new to `base` or differ from it in any COMPARE_COLUMNS
+    old = _by_asin(base, COMPARE_COLUMNS)
+    known = rows['asin'].isin(old.index).to_numpy()
+    cols = [c for c in COMPARE_COLUMNS if c in rows.columns and c in old.columns]
+    rows = _conform(rows[['asin'] + cols], base)
+    prev = old.reindex(rows['asin'].astype(object))[cols].to_numpy()
+    same = _same(rows[cols].to_numpy(), prev).all(axis=1)
+    return rows['asin'][~known | ~same].tolist()
+
+
+def merge_rows(base, updates, removed):
+    # base minus `removed`, with rows for known ASINs replaced in place and new ASINs appended
+    out = base[~base['asin'].isin(removed)].copy()
+    categorical = [c for c in out.columns if isinstance(out[c].dtype, pd.CategoricalDtype)]
+    # read-only text columns of an attached dataset (modules/snapshot.py)
+    text = [c for c in out.columns if isinstance(out[c].dtype, TextDtype)]
+    for col in categorical + text:
+        # new values may not be among the categories and text cannot be assigned to; re-encoded below
+        out[col] = out[col].astype(object)
+    upd = _conform(updates, out).drop_duplicates('asin').set_index('asin')
+    hit = out['asin'].isin(upd.index).to_numpy()
+    if hit.any():
+        matched = upd.loc[out['asin'][hit]]
+        for col in [c for c in matched.columns if c in out.columns]:
+            out.loc[hit, col] = matched[col].to_numpy()
+    new_rows = _conform(updates[~updates['asin'].isin(out['asin'])], out)
+    out = pd.concat([out, new_rows[[c for c in out.columns if c in new_rows.columns]]], ignore_index=True)
+    for col in categorical:
+        out[col] = out[col].astype('category')
+    for col in text:
+        out[col] = out[col].astype(TextDtype())
+    compute_volatility(out)
+    out['price_volatility'] = out['price_volatility'].astype(base['price_volatility'].dtype)
+    return out
+
+
+class CatalogWatcher:
+    # Polls a data directory for new, changed or deleted CSV files, diffs their rows by ASIN
+    # and swaps a new catalog version into `holder`. Only changed descriptions are re-scored.
+    def __init__(self, holder, data_dir, initial_files=(), interval=HOT_RELOAD_INTERVAL):
+        self.holder = holder
+        self.data_dir = data_dir
+        self.interval = interval
+        asins = set(holder.current.df['asin'])
+        # file -> (stat, ASINs it contributed)
+        self._files = {os.path.abspath(p): (_stat(p), asins) for p in initial_files}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        # one scan; returns True when a new catalog version was swapped in
+        current = {os.path.abspath(p): _stat(p) for p in glob.glob(os.path.join(self.data_dir, '*.csv'))}
+        changed = sorted(p for p, st in current.items() if p not in self._files or self._files[p][0] != st)
+        deleted = [p for p in self._files if p not in current]
+        if not changed and not deleted:
+            return False
+        self.apply(changed, deleted, current)
+        return True
+
+    def apply(self, changed_files, deleted_files, stats):
+        catalog = self.holder.current
+        base = catalog.df
+        frames = [pd.read_csv(p) for p in changed_files]
+        raw = pd.concat(frames, ignore_index=True) if frames else base.iloc[:0]
+
+        files = {p: v for p, v in self._files.items() if p not in deleted_files}
+        for path, frame in zip(changed_files, frames):
+            files[path] = (stats[path], set(frame['asin'].dropna()))
+        present = set().union(*(asins for _, asins in files.values())) if files else set()
+        touched = set().union(*(self._files[p][1] for p in changed_files + deleted_files if p in self._files))
+        removed = touched - present
+
+        rows = prepare_rows(raw, base) if len(raw) else raw
+        changed = diff_rows(rows, base) if len(rows) else []
+        if not changed and not removed:
+            self._files = files
+            return catalog
+
+        updates = rows[rows['asin'].isin(changed)]
+        df = merge_rows(base, updates, removed)
+        categories = set(updates['category'])
+        old_cats = _by_asin(base, ['category'])['category']
+        categories |= set(old_cats.reindex(list(set(changed) | removed)).dropna())
+
+        new_catalog = catalog.updated(df, changed, removed, categories)
+        self.holder.swap(new_catalog, asins=set(changed) | removed, categories=categories)
+        self._files = files
+        logger.info("catalog %s -> %s: %d changed, %d removed", catalog.version, new_catalog.version,
+                    len(changed), len(removed))
+        return new_catalog
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("catalog reload failed")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='catalog-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
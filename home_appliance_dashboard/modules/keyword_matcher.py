@@ -0,0 +1,134 @@
+import re
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+# texts matched per batch when streaming
+KEYWORD_CHUNK_SIZE = 10_000
+
+_WORD = re.compile(r'\w')
+
+
+def _is_word(ch):
+    return bool(_WORD.match(ch))
+
+
+def _trie_pattern(words):
+    # one regex for many literals: shared prefixes are factored out, longer continuations are
+    # tried before a word ends, so the longest keyword starting at a position wins
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = word
+
+    def render(node):
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if '' in node:
+            # whole-word match: the keyword may not run on into a longer word
+            branches.append(r'(?!\w)' if _is_word(node[''][-1]) else '')
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return render(trie)
+
+
+class KeywordMatcher:
+    # Case-insensitive whole-word matching of many keywords in one scan per text.
+    # Counts are per text (a keyword found twice in one text counts once), like keyword_counts.
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        ids = {}
+        for i, keyword in enumerate(self.keywords):
+            ids.setdefault(keyword.lower(), []).append(i)
+        self._ids = ids
+        # a match also implies every keyword that is a whole-word prefix of it (same start)
+        self._implied = {word: self._prefix_ids(word) for word in ids}
+        self._pattern = self._compile(list(ids))
+
+    def _prefix_ids(self, word):
+        found = list(self._ids[word])
+        for end in range(1, len(word)):
+            prefix = word[:end]
+            if prefix in self._ids and not (_is_word(prefix[-1]) and _is_word(word[end])):
+                found.extend(self._ids[prefix])
+        return found
+
+    @staticmethod
+    def _compile(words):
+        bounded = [w for w in words if w and _is_word(w[0])]
+        loose = [w for w in words if w and not _is_word(w[0])]
+        parts = []
+        if bounded:
+            parts.append(r'(?<!\w)' + _trie_pattern(bounded))
+        if loose:
+            parts.append(_trie_pattern(loose))
+        if not parts:
+            return None
+        # zero-width lookahead so overlapping keywords ("stopped working" / "working great") all match
+        return re.compile('(?=(' + '|'.join(parts) + '))', re.IGNORECASE)
+
+    def find(self, text):
+        # sorted ids of the keywords present in one text
+        if self._pattern is None or not isinstance(text, str):
+            return np.empty(0, dtype=np.int32)
+        found = set()
+        for match in self._pattern.finditer(text):
+            found.update(self._implied[match.group(1).lower()])
+        return np.fromiter(sorted(found), dtype=np.int32, count=len(found))
+
+    def match(self, texts):
+        # CSR-style (indptr, indices): keyword ids of text i are indices[indptr[i]:indptr[i + 1]]
+        found = [self.find(text) for text in texts]
+        indptr = np.zeros(len(found) + 1, dtype=np.int64)
+        np.cumsum([len(f) for f in found], out=indptr[1:])
+        indices = np.concatenate(found) if found else np.empty(0, dtype=np.int32)
+        return indptr, indices
+
+    def _chunks(self, texts, chunksize):
+        it = iter(texts)
+        while True:
+            chunk = list(islice(it, chunksize))
+            if not chunk:
+                return
+            yield chunk
+
+    def count(self, texts, chunksize=KEYWORD_CHUNK_SIZE):
+        # number of texts containing each keyword; texts may be any iterable (read chunk by chunk)
+        totals = np.zeros(len(self.keywords), dtype=np.int64)
+        for chunk in self._chunks(texts, chunksize):
+            _, indices = self.match(chunk)
+            totals += np.bincount(indices, minlength=len(self.keywords))
+        return dict(zip(self.keywords, totals.tolist()))
+
+    def count_by(self, texts, groups, chunksize=KEYWORD_CHUNK_SIZE):
+        # texts containing each keyword per group (e.g. category or ASIN), as a groups x keywords
+        # frame; groups is aligned with texts and streamed alongside them
+        k = len(self.keywords)
+        codes = {}
+        totals = np.zeros(0, dtype=np.int64)
+        group_iter = iter(groups)
+        for chunk in self._chunks(texts, chunksize):
+            chunk_groups = list(islice(group_iter, len(chunk)))
+            rows = np.fromiter((codes.setdefault(g, len(codes)) for g in chunk_groups),
+                               dtype=np.int64, count=len(chunk))
+            indptr, indices = self.match(chunk)
+            flat = np.repeat(rows, np.diff(indptr)) * k + indices
+            counts = np.bincount(flat, minlength=len(codes) * k)
+            if len(totals) < len(counts):
+                totals = np.concatenate([totals, np.zeros(len(counts) - len(totals), dtype=np.int64)])
+            totals[:len(counts)] += counts
+        totals = np.concatenate([totals, np.zeros(len(codes) * k - len(totals), dtype=np.int64)])
+        return pd.DataFrame(totals.reshape(len(codes), k), index=list(codes), columns=self.keywords)
+
+
+@lru_cache(maxsize=8)
+def _cached_matcher(keywords):
+    return KeywordMatcher(keywords)
+
+
+def keyword_matcher(keywords):
+    # compiled once per keyword set
+    return _cached_matcher(tuple(keywords))
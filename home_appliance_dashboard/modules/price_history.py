@@ -0,0 +1,62 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+HISTORY_DAYS = 90
+# used when a product has no price
+DEFAULT_BASE_PRICE = 20.0
+# products synthesized per block by the bulk helpers, to bound the temporary array
+BATCH_ROWS = 50_000
+
+
+def asin_seed(asin):
+    # stable across processes and runs, unlike the salted built-in hash()
+    return zlib.crc32(str(asin).encode('utf-8'))
+
+
+def history_dates(days=HISTORY_DAYS, end=None):
+    # the date axis shared by every product's history
+    end = pd.Timestamp.today() if end is None else pd.Timestamp(end)
+    return pd.date_range(end=end.normalize(), periods=days, freq='D')
+
+
+def _synthesize(prices, seeds, days):
+    base = np.asarray(prices, dtype=float)
+    base = np.where(np.isnan(base), DEFAULT_BASE_PRICE, base)
+    n = len(base)
+    n_drops = max(1, days // 30)
+
+    # one Generator per product, so a row never depends on which batch it was drawn in
+    noise = np.empty((n, days))
+    drop_idx = np.empty((n, n_drops), dtype=np.intp)
+    drop_frac = np.empty((n, n_drops))
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        noise[i] = rng.standard_normal(days)
+        drop_idx[i] = rng.integers(0, days, size=n_drops)
+        drop_frac[i] = rng.random(n_drops)
+
+    prices = base[:, None] * np.linspace(1.05, 0.95, days) + noise * (base * 0.03)[:, None]
+    rows = np.arange(n)
+    # sale dips: knock 12-32% off two consecutive days
+    for k in range(n_drops):
+        idx = drop_idx[:, k]
+        drop = prices[rows, idx] * (0.12 + drop_frac[:, k] * 0.2)
+        prices[rows, idx] -= drop
+        nxt = idx + 1
+        ok = nxt < days
+        prices[rows[ok], nxt[ok]] -= drop[ok]
+    return np.clip(prices, 0.5, None)
+
+
+def synthesize_price_histories(prices, asins, days=HISTORY_DAYS):
+    # products x days array of synthetic daily prices, reproducible per ASIN
+    return _synthesize(prices, [asin_seed(a) for a in asins], days)
+
+
+def synthesize_price_history(current_price, days=HISTORY_DAYS, seed=None):
+    # one product's history as a date/price frame (what the price chart plots)
+    prices = _synthesize([current_price], [seed], days)[0]
+    return pd.DataFrame({'date': history_dates(days), 'price': prices})
+
@@ -0,0 +1,335 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from modules.price_history import BATCH_ROWS, HISTORY_DAYS, history_dates, synthesize_price_histories
+
+# the dip/"SALE" rule: 3-day low more than 12% under the 30-day mean
+DIP_MIN_WINDOW = 3
+DIP_MEAN_WINDOW = 30
+DIP_RATIO = 0.88
+# names the version directory holding the complete store; replaced atomically on every save
+POINTER = 'current'
+
+
+def _write_json(path, obj):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _current_version(directory):
+    # the version directory `current` names; a store saved before versions is the directory itself
+    try:
+        with open(os.path.join(directory, POINTER), encoding='utf-8') as f:
+            return os.path.join(directory, f.read().strip())
+    except OSError:
+        return directory
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _load_day(path):
+    # a mapped bucket, or None when it is not on disk
+    return np.load(path, mmap_mode='r') if os.path.exists(path) else None
+
+
+class PriceStore:
+    # Append-only daily price log: one array per day (a bucket) holding every ASIN's price,
+    # with the rolling min/mean kept up to date as days are appended. Immutable once built:
+    # add_products / synced return a new store.
+    # On disk: a version directory named by the `current` file, holding meta.json, asins.npy
+    # (+ their sort order and listed prices) and per day days/<YYYY-MM-DD>.npy with .min.npy /
+    # .mean.npy beside it. load() maps all of it read-only, so every worker process reads the
+    # same pages instead of holding its own copy.
+    def __init__(self, asins, start, prices, listed, rolling=None, order=None):
+        self.asins = np.asarray(asins, dtype=str)
+        self._order = np.argsort(self.asins, kind='stable') if order is None else order
+        self.start = np.datetime64(pd.Timestamp(start).normalize().date(), 'D')
+        self.prices = list(prices)
+        # catalog price of each row as of the last sync, to tell which prices changed since
+        self.listed = listed
+        # version directory the store was loaded from or saved to, and the first day whose
+        # buckets are not in it
+        self._version = None
+        self._unsaved = 0
+        if rolling is None:
+            self.rolling_min, self.rolling_mean = [], []
+            self._recompute(0)
+        else:
+            self.rolling_min, self.rolling_mean = list(rolling[0]), list(rolling[1])
+
+    @classmethod
+    def from_synthetic(cls, df, days=HISTORY_DAYS, end=None, dtype=np.float32):
+        # seed the store with the synthetic histories, one batch at a time
+        first = (df['asin'].notna() & ~df['asin'].duplicated()).to_numpy()
+        asins = df['asin'].to_numpy()[first]
+        prices = df['price/value'].to_numpy()[first]
+        log = np.empty((days, len(asins)), dtype=dtype)
+        for s in range(0, len(asins), BATCH_ROWS):
+            log[:, s:s + BATCH_ROWS] = synthesize_price_histories(prices[s:s + BATCH_ROWS], asins[s:s + BATCH_ROWS], days).T
+        return cls(asins, history_dates(days, end)[0], list(log), prices.astype(float))
+
+    @classmethod
+    def open(cls, directory, df, days=HISTORY_DAYS):
+        # load the store from disk, backfilling any catalog ASINs it does not know yet and
+        # bringing it up to today at the catalog's prices
+        catalog = df[df['asin'].notna()].drop_duplicates('asin')
+        asins, prices = catalog['asin'].to_numpy(), catalog['price/value'].to_numpy()
+        store = cls.load(directory)
+        if store is None:
+            store = cls.from_synthetic(df, days)
+        else:
+            missing = store.rows_of(asins) < 0
+            if missing.any():
+                hist = synthesize_price_histories(prices[missing], asins[missing], store.days)
+                store = store.add_products(asins[missing], hist, prices[missing])
+        store = store.synced(asins, prices)
+        try:
+            store.save(directory)
+        except OSError:
+            # a concurrent save removed the version this one was writing; theirs is current
+            pass
+        return store
+
+    @property
+    def days(self):
+        return len(self.prices)
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(self.start + np.arange(self.days))
+
+    def __contains__(self, asin):
+        return self.rows_of([asin])[0] >= 0
+
+    def _recompute(self, start):
+        # each rolling value only looks back one window, so recompute from there
+        del self.rolling_min[start:], self.rolling_mean[start:]
+        n = len(self.asins)
+        # running sums from `lo` on; a window is the difference of two of them
+        sums, counts = deque(maxlen=DIP_MEAN_WINDOW + 1), deque(maxlen=DIP_MEAN_WINDOW + 1)
+        total, count = np.zeros(n), np.zeros(n, dtype=np.int64)
+        lo = max(0, start - DIP_MEAN_WINDOW)
+        for t in range(lo, self.days):
+            valid = ~np.isnan(self.prices[t])
+            total = total + np.where(valid, self.prices[t], 0)
+            count = count + valid
+            sums.append(total)
+            counts.append(count)
+            if t < start:
+                continue
+            window_sum, window_count = total, count
+            if t - DIP_MEAN_WINDOW >= lo:
+                window_sum, window_count = total - sums[0], count - counts[0]
+            dtype = self.prices[t].dtype
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(window_count > 0, window_sum / window_count, np.nan).astype(dtype)
+            if t < DIP_MIN_WINDOW - 1:
+                low = np.full(n, np.nan, dtype=dtype)
+            else:
+                low = np.minimum.reduce(self.prices[t - DIP_MIN_WINDOW + 1:t + 1])
+            # read-only from here on: an in-place write would race with request threads
+            for array in (self.prices[t], low, mean):
+                array.flags.writeable = False
+            self.rolling_min.append(low)
+            self.rolling_mean.append(mean)
+
+    def _column(self, rows, values, base=None):
+        # a day's prices: `values` at `rows` (-1 = not stored, skipped), the rest from base or NaN
+        if base is None:
+            column = np.full(len(self.asins), np.nan, dtype=self.prices[0].dtype if self.prices else np.float32)
+        else:
+            column = np.array(base)
+        known = rows >= 0
+        column[rows[known]] = np.asarray(values, dtype=float)[known]
+        return column
+
+    def synced(self, asins, prices, end=None):
+        # Store brought up to `end` (today) for the catalog's current prices: the days it is
+        # missing are appended at those prices (NaN for ASINs no longer listed); if it already
+        # ends there, ASINs whose price changed since the last sync take it as that day's price.
+        end = np.datetime64(pd.Timestamp.today().normalize().date() if end is None else pd.Timestamp(end).date(), 'D')
+        rows, prices = self.rows_of(asins), np.asarray(prices, dtype=float)
+        listed = self._column(rows, prices, self.listed)
+        missing = int((end - (self.start + self.days - 1)).astype(int))
+        if missing > 0:
+            column = self._column(rows, prices)
+            return self._derive(self.asins, self._order, self.prices + [column] * missing, self.days, listed)
+        known = rows >= 0
+        before = np.full(len(rows), np.nan)
+        before[known] = self.listed[rows[known]]
+        changed = rows[known & (prices != before) & ~(np.isnan(prices) & np.isnan(before))]
+        if not len(changed) or not self.days:
+            return self
+        column = self._column(changed, listed[changed], self.prices[-1])
+        return self._derive(self.asins, self._order, self.prices[:-1] + [column], self.days - 1, listed)
+
+    def add_products(self, asins, histories, prices):
+        # new ASINs with their full history over the store's date axis and their catalog
+        # prices, as a new store
+        histories = np.asarray(histories).reshape(len(asins), self.days)
+        columns = [np.concatenate([day, histories[:, i].astype(day.dtype)]) for i, day in enumerate(self.prices)]
+        listed = np.concatenate([self.listed, np.asarray(prices, dtype=float)])
+        return self._derive(np.concatenate([self.asins, np.asarray(asins, dtype=str)]), None, columns, 0, listed)
+
+    def _derive(self, asins, order, prices, start, listed=None):
+        # Copy-on-write: stores are shared by every catalog version and read from request
+        # threads, so changes build a new store that reuses the rolling values before `start`.
+        store = object.__new__(PriceStore)
+        store.asins = asins
+        store._order = np.argsort(asins, kind='stable') if order is None else order
+        store.start = self.start
+        store.prices = prices
+        store.listed = self.listed if listed is None else listed
+        store._version = self._version
+        store._unsaved = min(self._unsaved, start)
+        store.rolling_min, store.rolling_mean = list(self.rolling_min), list(self.rolling_mean)
+        store._recompute(start)
+        return store
+
+    def row_of(self, asin):
+        # row of asin in each day's prices / rolling_min / rolling_mean
+        return int(self._known_rows([asin])[0])
+
+    def rows_of(self, asins):
+        # row per ASIN, by binary search over the sorted ASINs; -1 for ASINs without a stored history
+        query = np.asarray([a if isinstance(a, str) else '' for a in asins], dtype=str)
+        if not len(self.asins) or not len(query):
+            return np.full(len(query), -1, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self.asins, query, sorter=self._order), len(self.asins) - 1)
+        rows = np.asarray(self._order)[i]
+        return np.where(self.asins[rows] == query, rows, -1).astype(np.int64)
+
+    def _known_rows(self, asins):
+        rows = self.rows_of(asins)
+        if (rows < 0).any():
+            raise KeyError(list(asins)[int(np.argmax(rows < 0))])
+        return rows
+
+    def _slice(self, start, end):
+        # inclusive date bounds -> column slice
+        lo = 0 if start is None else int(np.clip((np.datetime64(pd.Timestamp(start).date(), 'D') - self.start).astype(int), 0, self.days))
+        hi = self.days if end is None else int(np.clip((np.datetime64(pd.Timestamp(end).date(), 'D') - self.start).astype(int) + 1, 0, self.days))
+        return slice(lo, max(lo, hi))
+
+    def window(self, asin, start=None, end=None):
+        # date, price, rolling min/mean and dip flag for one ASIN over [start, end]
+        row = self.row_of(asin)
+        cols = self._slice(start, end)
+        rolling_min = np.array([day[row] for day in self.rolling_min[cols]])
+        rolling_mean = np.array([day[row] for day in self.rolling_mean[cols]])
+        with np.errstate(invalid='ignore'):
+            dips = rolling_min < rolling_mean * DIP_RATIO
+        return pd.DataFrame({
+            'date': self.dates[cols],
+            'price': np.array([day[row] for day in self.prices[cols]]),
+            'rolling_min': rolling_min,
+            'rolling_mean': rolling_mean,
+            'dip': dips,
+        })
+
+    def last(self, asin, n=HISTORY_DAYS):
+        return self.window(asin, start=self.dates[max(0, self.days - n)])
+
+    def _matrix(self, rows, days):
+        # products x days float copy of the given rows over the last `days` days
+        return np.column_stack([day[rows] for day in self.prices[-days:]]).astype(float)
+
+    def _per_product(self, reduce, asins, days):
+        # reduce(products x days matrix) for the last `days` days of every product (or those in
+        # asins), in row blocks
+        rows = np.arange(len(self.asins)) if asins is None else self._known_rows(asins)
+        out = np.empty(len(rows))
+        for s in range(0, len(out), BATCH_ROWS):
+            out[s:s + BATCH_ROWS] = reduce(self._matrix(rows[s:s + BATCH_ROWS], days))
+        return out
+
+    def volatility(self, asins=None, days=HISTORY_DAYS):
+        # std of each product's prices over the last `days` days
+        return self._per_product(lambda m: np.nanstd(m, axis=1, ddof=1), asins, days)
+
+    def quantile(self, q, asins=None, days=HISTORY_DAYS):
+        # q-quantile of each product's prices over the last `days` days
+        return self._per_product(lambda m: np.nanquantile(m, q, axis=1), asins, days)
+
+    def save(self, directory):
+        # Writes the store as a new version directory, then points `current` at it: a reader,
+        # or another worker saving at the same time, only ever sees a complete version (the
+        # last save wins). Buckets that did not change since the version this store came from
+        # are hard-linked from it. Nothing is written when that version already holds it all.
+        if self._version is not None and self._unsaved >= self.days:
+            return self._version
+        os.makedirs(directory, exist_ok=True)
+        base = self._version
+        version = tempfile.mkdtemp(prefix=f"v-{time.time_ns():020d}-", dir=directory)
+        os.makedirs(os.path.join(version, 'days'))
+        for i, day in enumerate(self.start + np.arange(self.days)):
+            for suffix, arrays in (('', self.prices), ('.min', self.rolling_min), ('.mean', self.rolling_mean)):
+                name = os.path.join('days', f"{day}{suffix}.npy")
+                if i < self._unsaved and os.path.exists(os.path.join(base, name)):
+                    _link_or_copy(os.path.join(base, name), os.path.join(version, name))
+                else:
+                    np.save(os.path.join(version, name), arrays[i])
+        # only added products (which rewrite every bucket) change the ASINs
+        for name, array in (('asins.npy', self.asins), ('order.npy', self._order)):
+            if self._unsaved and os.path.exists(os.path.join(base, name)):
+                _link_or_copy(os.path.join(base, name), os.path.join(version, name))
+            else:
+                np.save(os.path.join(version, name), array)
+        np.save(os.path.join(version, 'listed.npy'), self.listed)
+        _write_json(os.path.join(version, 'meta.json'), {'start': str(self.start), 'days': self.days, 'rows': len(self.asins)})
+
+        replaced = os.path.basename(_current_version(directory))
+        tmp = os.path.join(directory, f".{POINTER}-{os.getpid()}")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(os.path.basename(version))
+        os.replace(tmp, os.path.join(directory, POINTER))
+        # versions older than the one just replaced are unused: a reader that looked up
+        # `current` before this save still finds its version
+        for name in os.listdir(directory):
+            if name.startswith('v-') and replaced.startswith('v-') and name < replaced:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+        self._version, self._unsaved = version, self.days
+        return version
+
+    @classmethod
+    def load(cls, directory):
+        # the current version, or None when nothing complete is stored there
+        version = _current_version(directory)
+        try:
+            with open(os.path.join(version, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            asins = np.load(os.path.join(version, 'asins.npy'), mmap_mode='r')
+            order = np.load(os.path.join(version, 'order.npy'), mmap_mode='r')
+            listed = np.load(os.path.join(version, 'listed.npy'), mmap_mode='r')
+            start = np.datetime64(meta['start'], 'D')
+            paths = [os.path.join(version, 'days', f"{start + i}") for i in range(meta['days'])]
+            prices = [np.load(f"{path}.npy", mmap_mode='r') for path in paths]
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(asins) != meta['rows'] or len(order) != len(asins) or len(listed) != len(asins) \
+                or any(len(day) != len(asins) for day in prices):
+            return None
+        rolling_min = [_load_day(f"{path}.min.npy") for path in paths]
+        rolling_mean = [_load_day(f"{path}.mean.npy") for path in paths]
+        rolling = (rolling_min, rolling_mean)
+        if any(day is None or len(day) != len(asins) for day in rolling_min + rolling_mean):
+            # stored before the rolling buckets were
+            rolling = None
+        store = cls(asins, start, prices, listed, rolling, order)
+        store._version = version
+        store._unsaved = store.days if rolling is not None else 0
+        return store
@@ -0,0 +1,123 @@
+import bisect
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.snapshot import attachment_path, write_directory
+from modules.text_store import TextDtype
+
+LOOKUP_META = 'meta.json'
+
+
+class ProductRecord:
+    # one product as a positional offset into the index's column arrays; nothing is copied
+    __slots__ = ('_columns', 'position')
+
+    def __init__(self, columns, position):
+        self._columns = columns
+        self.position = position
+
+    def __getitem__(self, key):
+        return self._columns[key][self.position]
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def get(self, key, default=None):
+        col = self._columns.get(key)
+        if col is None:
+            return default
+        return col[self.position]
+
+    def to_dict(self):
+        return {k: col[self.position] for k, col in self._columns.items()}
+
+
+def _column_values(series):
+    # categoricals and text columns (e.g. the shared read-only dataset) are indexed as-is
+    # instead of decoded per row
+    if isinstance(series.dtype, (pd.CategoricalDtype, TextDtype)):
+        return series.array
+    return series.to_numpy()
+
+
+def asin_lookup(asins):
+    # row of each distinct ASIN's first occurrence, in ASIN order
+    asins = pd.Series(asins).astype(object)
+    valid = asins.notna().to_numpy()
+    first = np.flatnonzero(valid & ~asins.duplicated(keep='first').to_numpy())
+    order = np.argsort(asins.to_numpy()[first].astype(str), kind='stable')
+    return first[order].astype(np.int64)
+
+
+def asin_lookup_for(df, version):
+    # the lookup saved with df's snapshot for this data version, else a fresh one saved there
+    path = attachment_path(df, 'product_index')
+    if path:
+        try:
+            with open(os.path.join(path, LOOKUP_META), encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['version'] == version:
+                return np.load(os.path.join(path, 'sorted.npy'), mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            pass
+    lookup = asin_lookup(df['asin'])
+    if path:
+        def write(tmp):
+            np.save(os.path.join(tmp, 'sorted.npy'), lookup)
+            with open(os.path.join(tmp, LOOKUP_META), 'w', encoding='utf-8') as f:
+                json.dump({'version': version}, f)
+        try:
+            write_directory(path, write, LOOKUP_META)
+        except OSError:
+            pass
+    return lookup
+
+
+class ProductIndex:
+    # ASIN -> row offset over the output of load_and_preprocess_data, by binary search over
+    # the rows in ASIN order (asin_lookup; mapped from the snapshot when published there).
+    # Duplicate ASINs resolve to their first row; unknown or empty ASINs resolve to row 0.
+    def __init__(self, df, lookup=None):
+        self._columns = {col: _column_values(df[col]) for col in df.columns}
+        self._size = len(df)
+        self._sorted = asin_lookup(self._columns['asin']) if lookup is None else lookup
+        self.default_position = 0 if self._size else None
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, asin):
+        return self.position_of(asin) is not None
+
+    @property
+    def columns(self):
+        return self._columns
+
+    def position_of(self, asin):
+        if asin is None or (not isinstance(asin, str) and pd.isna(asin)):
+            return None
+        asins = self._columns['asin']
+        i = bisect.bisect_left(self._sorted, asin, key=lambda pos: asins[pos])
+        if i < len(self._sorted) and asins[self._sorted[i]] == asin:
+            return int(self._sorted[i])
+        return None
+
+    def record_at(self, position):
+        return ProductRecord(self._columns, position)
+
+    def asin_at(self, position):
+        return self._columns['asin'][position]
+
+    def get(self, asin):
+        pos = self.position_of(asin)
+        return None if pos is None else self.record_at(pos)
+
+    def lookup(self, asin):
+        # like get(), but falls back to the default product
+        pos = self.position_of(asin)
+        if pos is None:
+            pos = self.default_position
+        return None if pos is None else self.record_at(pos)
@@ -0,0 +1,184 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+from importlib.metadata import version
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from modules.category_stats import build_category_stats
+from utils.constants import (NO_REGRET_THRESHOLD, REGRET_HOLDOUT_FRACTION, REGRET_LABEL_QUANTILE,
+                             REGRET_MIN_HOLDOUT_AUC, REGRET_MODEL_PATH)
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ['price_rel_category', 'stars', 'log_reviews', 'sentiment_score', 'price_volatility']
+# bump when FEATURES, the label or the pipeline change; older model files are then retrained
+MODEL_VERSION = 3
+
+
+def model_features(df, category_stats=None):
+    # one row of FEATURES per product. Volatility is the stored-history one (risk_volatility)
+    # when regret_prediction.score_risk has run, else the rolling placeholder column.
+    if category_stats is None:
+        category_stats = build_category_stats(df)
+    means = pd.Series({c: s['price_mean'] for c, s in category_stats.items()}, dtype=float)
+    price = df['price/value'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel = price / means.reindex(df['category'].astype(object).to_numpy()).to_numpy()
+    volatility = df['risk_volatility'] if 'risk_volatility' in df else df['price_volatility']
+    return pd.DataFrame({
+        'price_rel_category': np.where(np.isfinite(rel), rel, np.nan),
+        'stars': df['stars'].to_numpy(dtype=float),
+        'log_reviews': np.log1p(df['reviewsCount'].to_numpy(dtype=float).clip(min=0)),
+        'sentiment_score': df['sentiment_score'].to_numpy(dtype=float),
+        'price_volatility': np.asarray(volatility, dtype=float),
+    }, index=df.index)
+
+
+def history_labels(df, price_store):
+    # no-regret purchase: today's price at or below REGRET_LABEL_QUANTILE of the product's own
+    # stored history (what the "Lowest in 1 year" badge claims). score_risk's category flag is
+    # not used: it is a threshold on the price relative to the category, which price_rel_category
+    # already is, so the model would only relearn it.
+    rows = price_store.rows_of(df['asin'])
+    known = rows >= 0
+    low = np.full(len(df), np.nan)
+    low[known] = price_store.quantile(REGRET_LABEL_QUANTILE, price_store.asins[rows[known]])
+    with np.errstate(invalid='ignore'):
+        return df['price/value'].to_numpy(dtype=float) <= low
+
+
+class RegretModel:
+    # Fitted pipeline plus the metadata needed to decide whether a saved copy is still usable.
+    def __init__(self, pipeline, meta):
+        self.pipeline = pipeline
+        self.meta = meta
+
+    @property
+    def passes(self):
+        # good enough on products it was not trained on to drive the badge
+        return self.meta.get('holdout_auc', 0.0) >= REGRET_MIN_HOLDOUT_AUC
+
+    def predict(self, features):
+        # probability of a no-regret purchase for every row, in one call
+        return self.pipeline.predict_proba(features[FEATURES].to_numpy())[:, 1]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path) or '.')
+        os.close(fd)
+        try:
+            joblib.dump({'pipeline': self.pipeline, 'meta': self.meta}, tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        # None when missing, unreadable, or built for other features / another scikit-learn
+        try:
+            saved = joblib.load(path)
+        except (OSError, EOFError, ValueError, KeyError, ImportError, AttributeError) as exc:
+            if os.path.exists(path):
+                logger.warning("could not load regret model %s: %s", path, exc)
+            return None
+        meta = saved.get('meta', {})
+        if meta.get('model_version') != MODEL_VERSION or meta.get('sklearn') != version('scikit-learn'):
+            logger.info("regret model %s is stale (%s), retraining", path, meta)
+            return None
+        return cls(saved['pipeline'], meta)
+
+
+def train_regret_model(df, price_store, category_stats=None):
+    # scikit-learn is only needed to fit; loading a saved model unpickles what it uses
+    from sklearn.impute import SimpleImputer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    features = model_features(df, category_stats)[FEATURES].to_numpy()
+    labels = history_labels(df, price_store)
+    if min(labels.sum(), (~labels).sum()) < 2:
+        logger.warning("regret model not trained: too few products in one label class")
+        return None
+    # stratified, so both classes are in the held-out part
+    train_x, test_x, train_y, test_y = train_test_split(
+        features, labels, test_size=REGRET_HOLDOUT_FRACTION, stratify=labels, random_state=0)
+    pipeline = make_pipeline(SimpleImputer(strategy='median'), StandardScaler(), LogisticRegression(max_iter=1000))
+    start = time.perf_counter()
+    pipeline.fit(train_x, train_y)
+    seconds = time.perf_counter() - start
+    holdout_auc = float(roc_auc_score(test_y, pipeline.predict_proba(test_x)[:, 1]))
+    meta = {
+        'model_version': MODEL_VERSION,
+        'sklearn': version('scikit-learn'),
+        'features': FEATURES,
+        'rows': len(train_y),
+        'positives': int(train_y.sum()),
+        'holdout_rows': len(test_y),
+        'holdout_auc': holdout_auc,
+        'train_seconds': seconds,
+        'trained_at': pd.Timestamp.now(tz='UTC').isoformat(),
+    }
+    logger.info("trained regret model on %d rows in %.3fs, held-out AUC %.3f", len(train_y), seconds, holdout_auc)
+    return RegretModel(pipeline, meta)
+
+
+def load_or_train(df, price_store, category_stats=None, path=REGRET_MODEL_PATH):
+    # the saved or freshly trained model, or None when it does not pass the held-out check
+    # (a failing model is still saved, so it is not retrained on every start)
+    model = RegretModel.load(path)
+    if model is None:
+        model = train_regret_model(df, price_store, category_stats)
+        if model is not None:
+            try:
+                model.save(path)
+            except OSError as exc:
+                logger.warning("could not save regret model %s: %s", path, exc)
+    if model is not None and not model.passes:
+        logger.warning("regret model held-out AUC %.3f is below %.3f; keeping the price heuristic",
+                       model.meta['holdout_auc'], REGRET_MIN_HOLDOUT_AUC)
+        return None
+    return model
+
+
+def with_regret_model(df, model, category_stats=None):
+    # regret_prob for every product and the badge flag derived from it
+    start = time.perf_counter()
+    prob = model.predict(model_features(df, category_stats))
+    seconds = time.perf_counter() - start
+    logger.info("scored %d products in %.4fs (%.0f rows/s)", len(df), seconds, len(df) / max(seconds, 1e-9))
+    return df.assign(regret_prob=prob, no_regret=prob >= NO_REGRET_THRESHOLD)
+
+
+if __name__ == "__main__":
+    # retrain and report: python -m modules.regret_model data/amazon_kitchenware.csv [model_path]
+    from modules.data_processing import load_dataset
+    from modules.price_store import PriceStore
+    from modules.regret_prediction import with_risk
+
+    data = load_dataset(sys.argv[1] if len(sys.argv) > 1 else 'data/amazon_kitchenware.csv')
+    store = PriceStore.from_synthetic(data)
+    data = with_risk(data, store.volatility()[store.rows_of(data['asin'])])
+    trained = train_regret_model(data, store)
+    if trained is None:
+        sys.exit("labels have a single class; nothing to train")
+    path = sys.argv[2] if len(sys.argv) > 2 else REGRET_MODEL_PATH or 'data/cache/regret_model.joblib'
+    trained.save(path)
+    feats = model_features(data)
+    start = time.perf_counter()
+    probs = trained.predict(feats)
+    seconds = time.perf_counter() - start
+    agreement = float(((probs >= NO_REGRET_THRESHOLD) == history_labels(data, store)).mean())
+    print(f"trained on {trained.meta['rows']} rows in {trained.meta['train_seconds']:.3f}s")
+    print(f"scored {len(data)} rows in {seconds:.4f}s ({len(data) / max(seconds, 1e-9):.0f} rows/s)")
+    print(f"agreement with the history label: {agreement:.1%}; held-out AUC {trained.meta['holdout_auc']:.3f}"
+          f" ({'passes' if trained.passes else 'below'} {REGRET_MIN_HOLDOUT_AUC}); saved to {path}")
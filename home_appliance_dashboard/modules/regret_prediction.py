@@ -1,6 +1,75 @@
-def detect_high_risk(df):
-    high_risk = df[df['sentiment_score'] < 0.2]
-    if not high_risk.empty:
-        return "High-risk products:\n" + ", ".join(high_risk['title'].head(5))
-    else:
-        return "No high-risk products detected."
+import numpy as np
+import pandas as pd
+
+from modules.category_stats import build_category_stats
+
+# radar axes, in the order the risk radar draws them
+RISK_METRICS = ['risk_volatility', 'risk_negative_sentiment', 'risk_low_rating', 'risk_review_share', 'risk_return']
+RISK_LABELS = ['Price Volatility', 'Negative Sentiment', 'Low Ratings', 'High Reviews', 'Return/Complaint']
+# weight of each metric (min-max scaled over the catalog) in regret_score
+RISK_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 1.0]
+RISK_COLUMNS = RISK_METRICS + ['regret_score', 'no_regret']
+# return-rate proxy: (1 - sentiment) * factor, capped
+RETURN_RATE_FACTOR = 0.2
+RETURN_RATE_CAP = 0.25
+
+
+def _scaled(values):
+    values = np.asarray(values, dtype=float)
+    lo, hi = np.nanmin(values), np.nanmax(values)
+    if not np.isfinite(hi - lo) or hi == lo:
+        return np.zeros_like(values)
+    return (values - lo) / (hi - lo)
+
+
+def score_risk(df, volatility=None, category_stats=None):
+    # The five radar metrics, the combined regret_score and the "No Regret" flag for every
+    # product at once, aligned with df's rows. volatility defaults to df['price_volatility'];
+    # category aggregates are looked up per category instead of re-filtered per product.
+    if category_stats is None:
+        category_stats = build_category_stats(df)
+    if volatility is None:
+        volatility = df['price_volatility']
+    cats = df['category'].astype(object)
+    table = pd.DataFrame.from_dict(category_stats, orient='index')
+    per_row = table.reindex(cats.to_numpy())
+
+    sentiment = df['sentiment_score']
+    price = df['price/value'].to_numpy(dtype=float)
+    p10 = per_row['price_p10'].to_numpy(dtype=float)
+
+    risk = pd.DataFrame({
+        'risk_volatility': np.asarray(volatility, dtype=float),
+        'risk_negative_sentiment': per_row['negative_rate'].fillna(0.0).to_numpy(dtype=float),
+        'risk_low_rating': ((5.0 - df['stars'].astype(float)) / 5.0).clip(lower=0).fillna(0).to_numpy(),
+        'risk_review_share': (df['reviewsCount'].to_numpy(dtype=float)
+                              / per_row['reviews_max'].fillna(1).to_numpy(dtype=float)),
+        'risk_return': ((1 - sentiment) * RETURN_RATE_FACTOR).clip(0.0, RETURN_RATE_CAP).fillna(0.0).to_numpy(),
+    }, index=df.index)
+    score = sum(w * _scaled(risk[m]) for w, m in zip(RISK_WEIGHTS, RISK_METRICS)) / sum(RISK_WEIGHTS)
+    risk['regret_score'] = np.nan_to_num(score)
+    # price at or below the category's 10th percentile
+    with np.errstate(invalid='ignore'):
+        risk['no_regret'] = price <= p10
+    return risk
+
+
+def with_risk(df, volatility=None, category_stats=None):
+    # df plus the RISK_COLUMNS (replacing stale ones)
+    risk = score_risk(df, volatility, category_stats)
+    return df.drop(columns=[c for c in RISK_COLUMNS if c in df.columns]).assign(**risk)
+
+
+def high_risk(df, n=5):
+    # top-n products by regret_score
+    if 'regret_score' not in df:
+        df = with_risk(df)
+    return df.nlargest(n, 'regret_score')
+
+
+def detect_high_risk(df, n=5):
+    ranked = high_risk(df, n)
+    if not ranked.empty:
+        return "High-risk products:\n" + ", ".join(ranked['title'])
+    else:
+        return "No high-risk products detected."
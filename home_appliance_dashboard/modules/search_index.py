@@ -0,0 +1,525 @@
+import heapq
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from modules.snapshot import attachment_path, write_directory
+
+SEARCH_FIELDS = ('title', 'brand', 'category')
+# a hit in the title counts more than one in the brand or category
+FIELD_WEIGHTS = (3.0, 2.0, 1.0)
+# bump when the saved layout changes
+INDEX_FORMAT = 2
+INDEX_META = 'meta.json'
+# Characters get dense ids so a trigram, a document and its flags pack into one int64 and a
+# build step is a single sort. Past the 2**ALPHABET_BITS - 2 most frequent characters the
+# rest share one id; queries containing those are verified against the text.
+ALPHABET_BITS = 13
+# documents per build step: 2**BLOCK_BITS, bounds the temporary arrays
+BLOCK_BITS = 15
+FLAG_BITS = 3 * len(SEARCH_FIELDS)
+# products added or removed since the build past which a reload rebuilds the postings
+# (Catalog.updated) instead of growing the overlay every uncached query scans
+OVERLAY_MAX = 1024
+
+_TOKEN = re.compile(r'\w+')
+# per field, trigram postings carry where the trigram occurs: anywhere, after a space, at the start
+_ANY, _WORD, _START = 1, 2, 4
+# char id 0 ends the key of a 1-character word prefix; the last id is shared by rare characters
+_OTHER = (1 << ALPHABET_BITS) - 1
+_ARRAYS = ('asins', 'by_asin', 'chars', 'tri_keys', 'tri_ptr', 'tri_docs', 'tri_flags',
+           'pre_keys', 'pre_ptr', 'pre_docs', 'pre_flags', 'tail_keys', 'tail_ptr', 'tail_docs', 'tail_flags')
+
+
+def _normalize(text):
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return ''
+    return ' '.join(str(text).lower().split())
+
+
+def _code_points(text):
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+
+
+def _trigram_key(ids, i):
+    return (ids[i] << (2 * ALPHABET_BITS)) | (ids[i + 1] << ALPHABET_BITS) | ids[i + 2]
+
+
+def _prefix_key(ids):
+    return int(ids[0] << ALPHABET_BITS | (ids[1] if len(ids) > 1 else 0))
+
+
+def _score(q, fields):
+    score = 0.0
+    for weight, text in zip(FIELD_WEIGHTS, fields):
+        pos = text.find(q)
+        if pos < 0:
+            continue
+        if pos == 0:
+            score += weight * 2.0
+        elif text[pos - 1] == ' ' or (' ' + q) in text:
+            score += weight * 1.5
+        else:
+            score += weight
+    return score
+
+
+def _prefix_score(q, fields):
+    # 1-2 character queries: only word prefixes count, the field's first word more
+    score = 0.0
+    for weight, text in zip(FIELD_WEIGHTS, fields):
+        words = _TOKEN.findall(text)
+        if text.startswith(q) and words and words[0].startswith(q):
+            score += weight * 2.0
+        elif any(word.startswith(q) for word in words):
+            score += weight * 1.5
+    return score
+
+
+def _field_entries(texts, field, char_ids, is_word):
+    # packed (key, doc in block, flags) of every trigram, every 1-2 character word prefix and
+    # the last two characters (where no trigram starts) in one field of a block of documents,
+    # computed over the block's characters at once
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    cp = _code_points(''.join(texts))
+    ids = char_ids[cp]
+    ends = np.cumsum(lengths)
+    end_of = np.repeat(ends, lengths)
+    pos = np.arange(len(cp))
+    at_start = pos == np.repeat(ends - lengths, lengths)
+    docs = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    shift = 3 * field
+
+    t = np.flatnonzero(pos + 2 < end_of)
+    after_space = ~at_start[t] & (cp[np.maximum(t - 1, 0)] == 32)
+    flags = (_ANY | _WORD * after_space | _START * at_start[t]) << shift
+    tri = _pack(_trigram_key(ids, t), docs[t], flags)
+
+    word = is_word[cp]
+    p = np.flatnonzero(word & (at_start | ~np.roll(word, 1)))
+    nxt = np.minimum(p + 1, max(len(cp) - 1, 0))
+    second = np.where((p + 1 < end_of[p]) & word[nxt], ids[nxt], 0)
+    flags = (_WORD | _START * at_start[p]) << shift
+    first = ids[p] << ALPHABET_BITS
+    pre = np.concatenate([_pack(first, docs[p], flags), _pack(first | second, docs[p], flags)])
+
+    e = np.flatnonzero(lengths >= 2)
+    t = ends[e] - 2
+    at_start = lengths[e] == 2
+    after_space = ~at_start & (cp[np.maximum(t - 1, 0)] == 32)
+    flags = (_ANY | _WORD * after_space | _START * at_start) << shift
+    tail = _pack(ids[t] << ALPHABET_BITS | ids[t + 1], e, flags)
+    return tri, pre, tail
+
+
+def _char_ids(chars, cp):
+    i = np.minimum(np.searchsorted(chars, cp), max(len(chars) - 1, 0))
+    found = chars[i] == cp if len(chars) else np.zeros(len(cp), dtype=bool)
+    return np.where(found, i + 1, _OTHER)
+
+
+def _pack(keys, docs, flags):
+    return (((keys << BLOCK_BITS) | docs) << FLAG_BITS) | flags
+
+
+def _reduce(packed, doc0):
+    # one (key, doc, flags) per key and document of a block, flags of all occurrences or-ed,
+    # sorted by key then doc
+    packed = np.sort(np.concatenate(packed))
+    pairs = packed >> FLAG_BITS
+    first = np.ones(len(packed), dtype=bool)
+    first[1:] = pairs[1:] != pairs[:-1]
+    at = np.flatnonzero(first)
+    flags = np.bitwise_or.reduceat(packed & ((1 << FLAG_BITS) - 1), at) if len(at) else packed
+    pairs = pairs[at]
+    docs = (pairs & ((1 << BLOCK_BITS) - 1)).astype(np.int32) + doc0
+    return pairs >> BLOCK_BITS, docs, flags.astype(np.uint16)
+
+
+def _postings(blocks):
+    # blocks cover increasing doc ranges, so a stable sort on the key keeps docs ascending
+    keys, docs, flags = (np.concatenate(a) for a in zip(*blocks))
+    order = np.argsort(keys, kind='stable')
+    keys, docs, flags = keys[order], docs[order], flags[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    at = np.flatnonzero(first)
+    ptr = np.append(at, len(keys)).astype(np.int64)
+    return keys[at], ptr, docs, flags
+
+
+def _ranked(postings, fields, other):
+    # within each key: highest score bound first, ties in catalog order (docs already ascend,
+    # and the bound is a small multiple of 0.5, so one stable sort on key and rank does it)
+    keys, ptr, docs, flags = postings
+    rank = (_field_weights(flags, fields, 2.0, 1.5, other) * 2).astype(np.int64)
+    owner = np.repeat(np.arange(len(keys), dtype=np.int64), np.diff(ptr))
+    order = np.argsort((owner << 16) - rank, kind='stable')
+    return keys, ptr, docs[order], flags[order]
+
+
+@lru_cache(maxsize=None)
+def _weight_table(fields, start, word, other):
+    # weighted score for every per-field position flags value
+    table = np.zeros(1 << (3 * fields))
+    for value in range(len(table)):
+        for field, weight in enumerate(FIELD_WEIGHTS[:fields]):
+            f = value >> (3 * field)
+            table[value] += weight * (start if f & _START else word if f & _WORD else other if f & _ANY else 0.0)
+    return table
+
+
+def _field_weights(flags, fields, start, word, other):
+    return _weight_table(fields, start, word, other)[flags]
+
+
+class SearchIndex:
+    # Trigram postings over title/brand/category. Queries are plain substrings
+    # (never regex); 1-2 character queries rank word-prefix matches first and fill the
+    # remaining places with substring matches.
+    # Postings are flat arrays (saved next to the dataset snapshot and memory-mapped when
+    # loaded). Trigram postings record, per field, whether the trigram occurs at the start,
+    # after a space or anywhere, which bounds a document's score before its text is read;
+    # word-prefix postings are stored best first, so a short query reads only k entries.
+    # Products added after the build live in a small overlay that is scanned directly,
+    # until overlay_size() passes OVERLAY_MAX.
+    def __init__(self, arrays, texts):
+        self._arrays = arrays
+        self._texts = texts
+        self._size = len(arrays['asins'])
+        self._removed = set()
+        self._extra = {}
+        self._extra_fields = []
+        self._extra_asins = []
+        self._search = lru_cache(maxsize=512)(self._search_uncached)
+
+    @classmethod
+    def from_frame(cls, df, fields=SEARCH_FIELDS):
+        asins = df['asin']
+        keep = (asins.notna() & ~asins.duplicated(keep='first')).to_numpy()
+        columns = [[_normalize(v) for v in (df[f].to_numpy()[keep] if f in df.columns else [None] * keep.sum())]
+                   for f in fields]
+        asin_values = np.asarray(asins.to_numpy()[keep], dtype=str)
+        chars, ids, word = cls._alphabet(columns)
+
+        tri_blocks, pre_blocks, tail_blocks = [], [], []
+        block = 1 << BLOCK_BITS
+        for doc0 in range(0, len(asin_values), block):
+            tri, pre, tail = [], [], []
+            for field, texts in enumerate(columns):
+                t, p, e = _field_entries(texts[doc0:doc0 + block], field, ids, word)
+                tri.append(t)
+                pre.append(p)
+                tail.append(e)
+            tri_blocks.append(_reduce(tri, doc0))
+            pre_blocks.append(_reduce(pre, doc0))
+            tail_blocks.append(_reduce(tail, doc0))
+        empty = (np.zeros(0, np.int64), np.zeros(0, np.int32), np.zeros(0, np.uint16))
+        tri_keys, tri_ptr, tri_docs, tri_flags = _ranked(_postings(tri_blocks or [empty]), len(fields), 1.0)
+        pre_keys, pre_ptr, pre_docs, pre_flags = _ranked(_postings(pre_blocks or [empty]), len(fields), 0.0)
+        tail_keys, tail_ptr, tail_docs, tail_flags = _postings(tail_blocks or [empty])
+
+        arrays = {
+            'asins': asin_values,
+            'by_asin': np.argsort(asin_values, kind='stable').astype(np.int32),
+            'chars': chars,
+            'tri_keys': tri_keys, 'tri_ptr': tri_ptr, 'tri_docs': tri_docs, 'tri_flags': tri_flags,
+            'pre_keys': pre_keys, 'pre_ptr': pre_ptr, 'pre_docs': pre_docs, 'pre_flags': pre_flags,
+            'tail_keys': tail_keys, 'tail_ptr': tail_ptr, 'tail_docs': tail_docs, 'tail_flags': tail_flags,
+        }
+        texts = []
+        for column in columns:
+            encoded = [text.encode('utf-8') for text in column]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+            texts.append((np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets))
+        return cls(arrays, texts)
+
+    @staticmethod
+    def _alphabet(columns):
+        # the indexed characters (the most frequent, sorted), and code point -> char id and
+        # code point -> is a regex word character tables, decided once per distinct code point
+        counts = np.zeros(1, dtype=np.int64)
+        for column in columns:
+            found = np.bincount(_code_points(''.join(column)))
+            if len(found) > len(counts):
+                found[:len(counts)] += counts
+                counts = found
+            else:
+                counts[:len(found)] += found
+        seen = np.flatnonzero(counts)
+        chars = np.sort(seen[np.argsort(-counts[seen], kind='stable')[:_OTHER - 1]])
+        ids = np.full(len(counts), _OTHER, dtype=np.int64)
+        ids[chars] = np.arange(1, len(chars) + 1)
+        word = np.zeros(len(counts), dtype=bool)
+        word[seen] = [bool(_TOKEN.match(chr(c))) for c in seen.tolist()]
+        return chars, ids, word
+
+    @classmethod
+    def for_frame(cls, df, version):
+        # the index saved with df's snapshot when it was built for this data version,
+        # else a fresh one, saved there for the next worker or restart
+        path = attachment_path(df, 'search')
+        index = cls.load(path, version) if path else None
+        if index is None:
+            index = cls.from_frame(df)
+            if path:
+                try:
+                    index.save(path, version)
+                except OSError:
+                    pass
+        return index
+
+    def save(self, path, version):
+        def write(tmp):
+            for name in _ARRAYS:
+                np.save(os.path.join(tmp, f"{name}.npy"), self._arrays[name])
+            for i, (data, offsets) in enumerate(self._texts):
+                np.save(os.path.join(tmp, f"text{i}.npy"), data)
+                np.save(os.path.join(tmp, f"offsets{i}.npy"), offsets)
+            with open(os.path.join(tmp, INDEX_META), 'w', encoding='utf-8') as f:
+                json.dump({'format': INDEX_FORMAT, 'version': version, 'fields': len(self._texts)}, f)
+        return write_directory(path, write, INDEX_META)
+
+    @classmethod
+    def load(cls, path, version=None):
+        # None unless a complete index for `version` is saved at path; arrays are mapped read-only
+        try:
+            with open(os.path.join(path, INDEX_META), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('format') != INDEX_FORMAT or (version is not None and meta.get('version') != version):
+            return None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in _ARRAYS}
+        texts = [(np.load(os.path.join(path, f"text{i}.npy"), mmap_mode='r'),
+                  np.load(os.path.join(path, f"offsets{i}.npy"), mmap_mode='r')) for i in range(meta['fields'])]
+        return cls(arrays, texts)
+
+    def __len__(self):
+        return self._size - len(self._removed) + len(self._extra)
+
+    def overlay_size(self):
+        # products added or removed since the postings were built
+        return len(self._removed) + len(self._extra_asins)
+
+    def copy(self):
+        # Independent index sharing the base arrays, which are never modified. A reload
+        # applies add/remove to a copy, so requests still reading the current catalog never
+        # see a half-updated index.
+        index = SearchIndex(self._arrays, self._texts)
+        index._removed = set(self._removed)
+        index._extra = dict(self._extra)
+        index._extra_fields = list(self._extra_fields)
+        index._extra_asins = list(self._extra_asins)
+        return index
+
+    def _base_doc(self, asin):
+        asins, by_asin = self._arrays['asins'], self._arrays['by_asin']
+        i = int(np.searchsorted(asins, asin, sorter=by_asin))
+        if i < len(by_asin) and asins[by_asin[i]] == asin:
+            return int(by_asin[i])
+        return None
+
+    def add(self, asin, *values):
+        # values follow SEARCH_FIELDS; re-adding an ASIN replaces it
+        self.remove(asin)
+        self._extra[asin] = len(self._extra_asins)
+        self._extra_asins.append(asin)
+        self._extra_fields.append(tuple(_normalize(v) for v in values))
+        self._search.cache_clear()
+
+    def remove(self, asin):
+        if asin in self._extra:
+            del self._extra[asin]
+        else:
+            doc = self._base_doc(asin)
+            if doc is None or doc in self._removed:
+                return
+            self._removed.add(doc)
+        self._search.cache_clear()
+
+    def cache_stats(self):
+        info = self._search.cache_info()
+        total = info.hits + info.misses
+        return {'size': info.currsize, 'maxsize': info.maxsize, 'hits': info.hits, 'misses': info.misses,
+                'hit_rate': info.hits / total if total else 0.0}
+
+    def _fields(self, doc):
+        return tuple(data[offsets[doc]:offsets[doc + 1]].tobytes().decode('utf-8') for data, offsets in self._texts)
+
+    def _postings_of(self, prefix, key):
+        keys, ptr = self._arrays[f"{prefix}_keys"], self._arrays[f"{prefix}_ptr"]
+        i = int(np.searchsorted(keys, key))
+        if i == len(keys) or keys[i] != key:
+            return None
+        return slice(int(ptr[i]), int(ptr[i + 1]))
+
+    def _live(self, docs):
+        if not self._removed:
+            return np.ones(len(docs), dtype=bool)
+        return ~np.isin(docs, np.fromiter(self._removed, dtype=np.int32, count=len(self._removed)))
+
+    def _query_ids(self, q):
+        # char ids of q, and whether they are exact (no character shares the rare-character id)
+        ids = _char_ids(self._arrays['chars'], _code_points(q))
+        return ids, not (ids == _OTHER).any()
+
+    def _top(self, batches, k, q=None, score_of=None):
+        # (-score, doc) of the k best live documents from (docs, bounds) batches in rank order.
+        # Without score_of the bounds are the scores, else each document is scored until no
+        # remaining one can reach the k-th best.
+        best = []
+        for docs, bounds in batches:
+            live = self._live(docs)
+            for doc, bound, ok in zip(docs.tolist(), bounds.tolist(), live.tolist()):
+                if len(best) == k and (bound, -doc) < best[0]:
+                    return [(-score, -neg_doc) for score, neg_doc in best]
+                if not ok:
+                    continue
+                score = bound if score_of is None else score_of(q, self._fields(doc))
+                if score > 0:
+                    entry = (score, -doc)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+        return [(-score, -neg_doc) for score, neg_doc in best]
+
+    def _walk(self, prefix, at, other, keep=None):
+        # the postings at `at` in rank order, in growing batches, with their score bounds
+        docs, flags = self._arrays[f"{prefix}_docs"], self._arrays[f"{prefix}_flags"]
+        start, size = at.start, 64
+        while start < at.stop:
+            stop = min(at.stop, start + size)
+            batch, batch_flags = np.asarray(docs[start:stop]), np.asarray(flags[start:stop])
+            if keep is not None:
+                mask = keep(batch)
+                batch, batch_flags = batch[mask], batch_flags[mask]
+            yield batch, _field_weights(batch_flags, len(self._texts), 2.0, 1.5, other)
+            start, size = stop, size * 4
+
+    def _prefix_hits(self, q, k):
+        # rare characters share ids, and then the stored scores are only bounds
+        if not _TOKEN.fullmatch(q):
+            return []
+        ids, exact = self._query_ids(q)
+        at = self._postings_of('pre', _prefix_key(ids))
+        if at is None:
+            return []
+        batches = self._walk('pre', at, 0.0)
+        return self._top(batches, k) if exact else self._top(batches, k, q, _prefix_score)
+
+    def _trigram_hits(self, q, k):
+        # Walks the postings of q's first trigram, whose position flags bound the score, best
+        # bound first; documents missing any other trigram of q are dropped, the rest verified
+        # against the text until no remaining bound can reach the k-th best.
+        ids, exact = self._query_ids(q)
+        keys = dict.fromkeys(int(_trigram_key(ids, i)) for i in range(len(ids) - 2))
+        spans = [self._postings_of('tri', key) for key in keys]
+        if any(s is None for s in spans):
+            return []
+        keep = None
+        if len(spans) > 1:
+            docs = self._arrays['tri_docs']
+            hits = np.zeros(self._size, dtype=np.uint8 if len(spans) < 256 else np.int64)
+            for s in spans[1:]:
+                hits[docs[s]] += 1
+            keep = lambda batch: hits[batch] == len(spans) - 1
+        batches = self._walk('tri', spans[0], 1.0, keep)
+        if exact and len(ids) == 3:
+            # the trigram is the whole query: the bound is the score
+            return self._top(batches, k)
+        return self._top(batches, k, q, _score)
+
+    def _substring_hits(self, q, k, skip):
+        # (-score, doc) of the k best live documents containing q anywhere, not in skip; the
+        # per-field position flags of the matches give the same score as _score
+        pattern = np.frombuffer(q.encode('utf-8'), dtype=np.uint8)
+        ids, exact = self._query_ids(q)
+        if exact and len(ids) == 2:
+            # q starts a trigram (the postings of every trigram beginning with q are one key
+            # range) or is the last two characters of a field
+            keys, ptr = self._arrays['tri_keys'], self._arrays['tri_ptr']
+            low = int(ids[0] << (2 * ALPHABET_BITS) | ids[1] << ALPHABET_BITS)
+            i, j = np.searchsorted(keys, [low, low + (1 << ALPHABET_BITS)])
+            spans = [('tri', slice(int(ptr[i]), int(ptr[j]))), ('tail', self._postings_of('tail', _prefix_key(ids)))]
+            found = [(np.asarray(self._arrays[f"{name}_docs"][at]), np.asarray(self._arrays[f"{name}_flags"][at]))
+                     for name, at in spans if at is not None]
+        else:
+            # one character, or one sharing the rare-character id: the texts are scanned
+            found = [self._field_matches(field, pattern) for field in range(len(self._texts))]
+        docs, flags = (np.concatenate(a) for a in zip(*found))
+        order = np.argsort(docs, kind='stable')
+        docs, flags = docs[order], flags[order]
+        first = np.ones(len(docs), dtype=bool)
+        first[1:] = docs[1:] != docs[:-1]
+        at = np.flatnonzero(first)
+        if not len(at):
+            return []
+        docs, flags = docs[at], np.bitwise_or.reduceat(flags, at)
+        keep = self._live(docs)
+        if skip:
+            keep &= ~np.isin(docs, list(skip))
+        docs, flags = docs[keep], flags[keep]
+        scores = _field_weights(flags, len(self._texts), 2.0, 1.5, 1.0)
+        best = np.lexsort((docs, -scores))[:k]
+        return list(zip((-scores[best]).tolist(), docs[best].tolist()))
+
+    def _field_matches(self, field, pattern):
+        # (doc, position flags) of every occurrence of the UTF-8 pattern in one field's text
+        data, offsets = self._texts[field]
+        data, offsets = np.asarray(data), np.asarray(offsets)
+        n = max(len(data) - len(pattern) + 1, 0)
+        match = data[:n] == pattern[0]
+        for i in range(1, len(pattern)):
+            match &= data[i:i + n] == pattern[i]
+        pos = np.flatnonzero(match)
+        docs = np.searchsorted(offsets, pos, side='right') - 1
+        # a match running on into the next document's text does not count
+        inside = pos + len(pattern) <= offsets[docs + 1]
+        pos, docs = pos[inside], docs[inside]
+        at_start = pos == offsets[docs]
+        after_space = ~at_start & (data[np.maximum(pos - 1, 0)] == 32)
+        flags = (_ANY | _WORD * after_space | _START * at_start) << (3 * field)
+        return docs.astype(np.int32), flags.astype(np.uint16)
+
+    def _extra_hits(self, q, score_of, skip=()):
+        ranked = []
+        for asin, doc in self._extra.items():
+            score = score_of(q, self._extra_fields[doc])
+            if score > 0 and self._size + doc not in skip:
+                ranked.append((-score, self._size + doc))
+        return ranked
+
+    def _search_uncached(self, q, k):
+        # ties keep catalog order (products added since the build last), so results are deterministic
+        if len(q) >= 3:
+            ranked = self._trigram_hits(q, k) + self._extra_hits(q, _score)
+            return tuple(self._asin_of(doc) for _, doc in heapq.nsmallest(k, ranked))
+        hits = heapq.nsmallest(k, self._prefix_hits(q, k) + self._extra_hits(q, _prefix_score))
+        if len(hits) < k:
+            # too few word prefixes: substring matches fill the remaining places, after them
+            seen = {doc for _, doc in hits}
+            rest = self._substring_hits(q, k - len(hits), seen) + self._extra_hits(q, _score, seen)
+            hits += heapq.nsmallest(k - len(hits), rest)
+        return tuple(self._asin_of(doc) for _, doc in hits)
+
+    def _asin_of(self, doc):
+        if doc >= self._size:
+            return self._extra_asins[doc - self._size]
+        return str(self._arrays['asins'][doc])
+
+    def search(self, query, k=10):
+        q = _normalize(query)
+        if not q:
+            return []
+        return list(self._search(q, k))
+
+    def best(self, query):
+        hits = self.search(query, k=1)
+        return hits[0] if hits else None
@@ -1,14 +1,124 @@
-from textblob import TextBlob
-
-def compute_sentiment(text):
-    if not text:
-        return 0
-    return TextBlob(text).sentiment.polarity
-
-def keyword_counts(texts, keywords):
-    counts = {k: 0 for k in keywords}
-    for text in texts:
-        for k in keywords:
-            if k.lower() in text.lower():
-                counts[k] += 1
-    return counts
+import logging
+import os
+import sqlite3
+from importlib.metadata import version
+
+import numpy as np
+import pandas as pd
+
+from modules.keyword_matcher import keyword_matcher
+from modules.sentiment_cache import SentimentCache
+from utils.constants import COMPLAINT_KEYWORDS, SENTIMENT_CACHE_MAX_ENTRIES, SENTIMENT_CACHE_PATH
+from utils.helpers import process_pool
+
+logger = logging.getLogger(__name__)
+
+# unique descriptions per worker task
+SENTIMENT_CHUNK_SIZE = 256
+# joins the complaint keywords found in one description
+KEYWORD_SEPARATOR = '|'
+# bump when score_text changes so cached scores from the old rule are not reused
+SCORER_VERSION = f"textblob-{version('textblob')}-polarity-1"
+
+_default_cache = None
+
+
+def _clean(text):
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return ""
+    text = str(text)
+    return text if text.strip() else ""
+
+
+def score_text(text):
+    # the one scoring rule shared by single-text and batch scoring
+    text = _clean(text)
+    if not text:
+        return 0.0
+    # imported on first use: textblob pulls in NLTK, which dominates app import time
+    from textblob import TextBlob
+    return TextBlob(text).sentiment.polarity
+
+
+def _score_chunk(chunk):
+    return [score_text(t) for t in chunk]
+
+
+def default_sentiment_cache():
+    # None when the cache file cannot be opened (e.g. read-only deployment); scoring still works
+    global _default_cache
+    if _default_cache is None:
+        try:
+            cache = SentimentCache(SENTIMENT_CACHE_PATH, SCORER_VERSION, SENTIMENT_CACHE_MAX_ENTRIES)
+            len(cache)
+            _default_cache = cache
+        except (OSError, sqlite3.Error) as exc:
+            logger.warning("sentiment cache disabled: %s", exc)
+            _default_cache = False
+    return _default_cache if _default_cache is not False else None
+
+
+def set_default_sentiment_cache(cache):
+    # replaces the cache the pipeline scores through (None disables it); returns the old one
+    global _default_cache
+    previous = default_sentiment_cache()
+    _default_cache = False if cache is None else cache
+    return previous
+
+
+def score_texts(texts, workers=None, chunksize=SENTIMENT_CHUNK_SIZE, progress=None, cache=None, pool=None):
+    # Scores each distinct non-empty text once, spreading chunks over a process pool (`pool`
+    # when given, e.g. one shared by every chunk of a streamed file, else one of `workers`).
+    # Texts found in cache are not rescored and new scores are written back.
+    # progress(done, total) is called after every chunk; returns an array aligned with texts.
+    texts = [_clean(t) for t in texts]
+    unique = list(dict.fromkeys(t for t in texts if t))
+    scores = cache.get_many(unique) if cache is not None else {}
+    if scores:
+        unique = [t for t in unique if t not in scores]
+    chunks = [unique[i:i + chunksize] for i in range(0, len(unique), chunksize)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(chunks))
+
+    own_pool = process_pool(workers) if pool is None and workers > 1 else None
+    pool = pool or own_pool
+    results = pool.map(_score_chunk, chunks) if pool else map(_score_chunk, chunks)
+    done = 0
+    try:
+        for chunk, chunk_scores in zip(chunks, results):
+            new_scores = dict(zip(chunk, chunk_scores))
+            scores.update(new_scores)
+            if cache is not None:
+                cache.put_many(new_scores)
+            done += len(chunk)
+            if progress:
+                progress(done, len(unique))
+    finally:
+        if own_pool:
+            own_pool.shutdown()
+
+    return np.fromiter((scores.get(t, 0.0) for t in texts), dtype=float, count=len(texts))
+
+
+def compute_sentiment(text):
+    text = _clean(text)
+    cache = default_sentiment_cache() if text else None
+    if cache is None:
+        return score_text(text)
+    score = cache.get(text)
+    if score is None:
+        score = score_text(text)
+        cache.put(text, score)
+    return score
+
+def keyword_counts(texts, keywords):
+    # texts containing each keyword (case-insensitive, whole words); one scan per text
+    return keyword_matcher(keywords).count(texts)
+
+
+def complaint_keywords(texts, keywords=COMPLAINT_KEYWORDS):
+    # the keywords found in each text, KEYWORD_SEPARATOR-joined ('' when none); counted per
+    # category for the "Review Topics" panel
+    matcher = keyword_matcher(keywords)
+    return [KEYWORD_SEPARATOR.join(matcher.keywords[i] for i in matcher.find(text)) for text in texts]
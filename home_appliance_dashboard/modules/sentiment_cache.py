@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# evict down to this fraction of max_entries so a full cache does not evict on every write
+_EVICT_TO = 0.9
+_BATCH = 500
+# a hit re-stamps `used` only once the stamp is older than this, so reads rarely write
+_TOUCH_AFTER = 24 * 3600
+
+
+def _digest(version, text):
+    return hashlib.blake2b(f"{version}\0{text}".encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SentimentCache:
+    # On-disk score cache keyed by a hash of (scorer version, text). SQLite in WAL mode
+    # with a busy timeout, so several worker processes on one host can share the file.
+    def __init__(self, path, version, max_entries=500_000):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        # rows in the file as of connect plus the ones this process inserted since; other
+        # processes' inserts are not seen, so the real count is taken before evicting
+        self._count = 0
+
+    def _connect(self):
+        # connections must not cross a fork; reopen in each process
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS scores '
+                         '(key TEXT PRIMARY KEY, score REAL NOT NULL, used INTEGER NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS scores_used ON scores (used)')
+        self._count = conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    def key(self, text):
+        return _digest(self.version, text)
+
+    def get_many(self, texts):
+        # returns {text: score} for the texts already cached, and marks stale ones recently used
+        keys = {self.key(t): t for t in texts}
+        found = {}
+        now = int(time.time())
+        key_list = list(keys)
+        with self._lock:
+            conn = self._connect()
+            for i in range(0, len(key_list), _BATCH):
+                batch = key_list[i:i + _BATCH]
+                marks = ','.join('?' * len(batch))
+                rows = conn.execute(f'SELECT key, score, used FROM scores WHERE key IN ({marks})', batch).fetchall()
+                for k, score, _ in rows:
+                    found[keys[k]] = score
+                stale = [k for k, _, used in rows if used < now - _TOUCH_AFTER]
+                if stale:
+                    with conn:
+                        conn.execute(f'UPDATE scores SET used = ? WHERE key IN ({",".join("?" * len(stale))})',
+                                     [now] + stale)
+        return found
+
+    def get(self, text):
+        return self.get_many([text]).get(text)
+
+    def put_many(self, scores):
+        if not scores:
+            return
+        now = int(time.time())
+        rows = [(self.key(t), float(s), now) for t, s in scores.items()]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                # a key already present holds the same score (the key covers scorer version and text)
+                before = conn.total_changes
+                conn.executemany('INSERT OR IGNORE INTO scores (key, score, used) VALUES (?, ?, ?)', rows)
+                self._count += conn.total_changes - before
+                if self._count > self.max_entries:
+                    self._count = conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+                if self._count > self.max_entries:
+                    excess = self._count - int(self.max_entries * _EVICT_TO)
+                    conn.execute('DELETE FROM scores WHERE key IN '
+                                 '(SELECT key FROM scores ORDER BY used ASC LIMIT ?)', (excess,))
+                    self._count -= excess
+
+    def put(self, text, score):
+        self.put_many({text: score})
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
@@ -0,0 +1,55 @@
+import os
+import sys
+
+from modules.catalog import Catalog
+from modules.data_processing import SNAPSHOT_TAG, load_dataset
+from modules.snapshot import load_snapshot, remove_stale_snapshots, save_snapshot, snapshot_path
+from utils.constants import SHARED_DATASET_DIR
+
+# names the snapshot workers should attach to; replaced atomically on every publish
+POINTER = 'current'
+ENV_VAR = 'DASHBOARD_SHARED_DATASET'
+
+
+def publish_dataset(file_path, shared_dir=SHARED_DATASET_DIR):
+    # Run once, in the loader process, before the workers start. Builds (or reuses) the
+    # preprocessed snapshot inside shared_dir, which should be on tmpfs (/dev/shm).
+    path = snapshot_path(file_path, cache_dir=shared_dir, extra=SNAPSHOT_TAG)
+    if not os.path.exists(os.path.join(path, 'manifest.json')):
+        save_snapshot(load_dataset(file_path), path)
+    # the search index and ASIN lookup are saved into the snapshot and the price store
+    # buckets to disk, so workers map them instead of building their own copies
+    Catalog.build(load_snapshot(path, shared=True))
+
+    tmp = os.path.join(shared_dir, f".{POINTER}-{os.getpid()}")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(path))
+    os.replace(tmp, os.path.join(shared_dir, POINTER))
+    # workers still mapping an older snapshot keep it alive until they exit
+    remove_stale_snapshots(path)
+    return path
+
+
+def attach_dataset(shared_dir=SHARED_DATASET_DIR, columns=None):
+    # Read-only, zero-copy view of the published dataset; None if nothing has been published.
+    try:
+        with open(os.path.join(shared_dir, POINTER), encoding='utf-8') as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return load_snapshot(os.path.join(shared_dir, name), shared=True, columns=columns)
+
+
+def load_worker_dataset(file_path):
+    # attach to the shared dataset when DASHBOARD_SHARED_DATASET names a published directory,
+    # otherwise load (or snapshot-load) privately as before
+    shared_dir = os.environ.get(ENV_VAR)
+    df = attach_dataset(shared_dir) if shared_dir else None
+    if df is None:
+        df = load_dataset(file_path)
+    return df
+
+
+if __name__ == "__main__":
+    # python -m modules.shared_dataset data/amazon_kitchenware.csv [shared_dir]
+    print(publish_dataset(sys.argv[1], *sys.argv[2:3]))
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from modules.text_store import TextArray, TextStore, TextStoreWriter
+
+# bump when the on-disk layout changes
+SNAPSHOT_FORMAT = 2
+MANIFEST = 'manifest.json'
+# string columns with more distinct values than this fraction of rows (asin, title) are
+# stored as UTF-8 bytes plus offsets rather than codes into a table of distinct values
+TEXT_UNIQUE_RATIO = 0.5
+# df.attrs key naming the snapshot directory a frame was loaded from (or saved to)
+SNAPSHOT_ATTR = 'snapshot'
+
+
+def source_fingerprint(file_path, extra=''):
+    # changes whenever the source file (or whatever `extra` describes, e.g. the scorer) changes
+    st = os.stat(file_path)
+    tag = hashlib.blake2b(extra.encode('utf-8'), digest_size=4).hexdigest()
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}-{tag}"
+
+
+def snapshot_path(file_path, cache_dir=None, extra=''):
+    # one directory per source version, so a rebuilt snapshot never overwrites one in use
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(file_path), 'cache')
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{source_fingerprint(file_path, extra)}.snapshot")
+
+
+def _column_kind(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return 'category'
+    if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+        return 'numeric'
+    return 'string'
+
+
+def _codes_dtype(n):
+    # the same width pandas picks for categorical codes, so codes load without a copy
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _write_column(directory, i, series):
+    kind = _column_kind(series)
+    meta = {'name': series.name, 'kind': kind, 'dtype': str(series.dtype)}
+    if kind == 'numeric':
+        np.save(os.path.join(directory, f"{i}.npy"), series.to_numpy())
+        return meta
+    if kind == 'category':
+        codes = series.cat.codes.to_numpy()
+        table = series.cat.categories.tolist()
+        meta['dtype'] = 'category'
+        meta['ordered'] = bool(series.cat.ordered)
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        if len(uniques) > TEXT_UNIQUE_RATIO * len(series):
+            meta['kind'] = 'text'
+            writer = TextStoreWriter(os.path.join(directory, f"{i}.text"))
+            writer.extend(series)
+            writer.close()
+            return meta
+        table = [str(v) for v in uniques]
+    np.save(os.path.join(directory, f"{i}.codes.npy"), codes.astype(_codes_dtype(len(table)), copy=False))
+    with open(os.path.join(directory, f"{i}.strings.json"), 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False)
+    return meta
+
+
+def write_directory(path, write, marker):
+    # write(tmp) into a private temp dir, then rename it to path; concurrent builders race
+    # harmlessly (the loser's copy is dropped once `marker` shows the winner's is complete)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=parent)
+    try:
+        write(tmp)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            if not os.path.exists(os.path.join(path, marker)):
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def save_snapshot(df, path):
+    def write(tmp):
+        columns = [_write_column(tmp, i, df[col]) for i, col in enumerate(df.columns)]
+        manifest = {'format': SNAPSHOT_FORMAT, 'rows': len(df), 'columns': columns}
+        with open(os.path.join(tmp, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+    write_directory(path, write, MANIFEST)
+    # structures derived from this frame (search index, ...) can be stored next to it
+    df.attrs[SNAPSHOT_ATTR] = path
+    return path
+
+
+def attachment_path(df, name):
+    # directory for a structure derived from df inside the snapshot df came from, or None
+    path = df.attrs.get(SNAPSHOT_ATTR)
+    return None if path is None else os.path.join(path, name)
+
+
+def remove_stale_snapshots(path):
+    # drop snapshots of older versions of the same source file
+    parent = os.path.dirname(path)
+    stem = os.path.basename(path).rsplit('-', 3)[0]
+    for name in os.listdir(parent):
+        full = os.path.join(parent, name)
+        if full != path and name.endswith('.snapshot') and name.rsplit('-', 3)[0] == stem:
+            shutil.rmtree(full, ignore_errors=True)
+
+
+def _read_table(directory, i):
+    with open(os.path.join(directory, f"{i}.strings.json"), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _mmap(path, mode):
+    # 'c' is copy-on-write: pages stay shared with the page cache until something writes to them.
+    # Viewed as a plain ndarray so pandas never sees the memmap subclass.
+    return np.load(path, mmap_mode=mode).view(np.ndarray)
+
+
+def _read_column(directory, i, meta, shared):
+    mode = 'r' if shared else 'c'
+    if meta['kind'] == 'numeric':
+        return _mmap(os.path.join(directory, f"{i}.npy"), mode)
+    if meta['kind'] == 'text':
+        store = TextStore(os.path.join(directory, f"{i}.text"))
+        if shared:
+            # decoded row by row as it is read; the bytes stay in the page cache
+            return TextArray(store)
+        values = np.array([np.nan if v is None else v for v in store.take(range(len(store)))], dtype=object)
+        return pd.array(values, dtype=meta['dtype'])
+    codes = _mmap(os.path.join(directory, f"{i}.codes.npy"), mode)
+    table = _read_table(directory, i)
+    if meta['kind'] == 'category' or shared:
+        # categorical over the mapped codes: only the distinct values are materialized
+        return pd.Categorical.from_codes(codes, categories=table, ordered=meta.get('ordered', False))
+    # trailing NaN makes the -1 sentinel decode to a missing value
+    values = np.array(table + [np.nan], dtype=object)[codes]
+    return pd.array(values, dtype=meta['dtype'])
+
+
+def load_snapshot(path, shared=False, columns=None):
+    # None when there is no complete snapshot at path. shared=True maps everything read-only:
+    # repeated strings load as categoricals and mostly-unique ones as TextArrays over the
+    # stored bytes, so nothing per row is copied into the process.
+    try:
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        return None
+    data = {meta['name']: _read_column(path, i, meta, shared)
+            for i, meta in enumerate(manifest['columns'])
+            if columns is None or meta['name'] in columns}
+    df = pd.DataFrame(data, copy=False)
+    df.attrs[SNAPSHOT_ATTR] = path
+    return df
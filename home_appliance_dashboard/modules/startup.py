@@ -0,0 +1,91 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.profiling import has_token, span
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    # Wall time of each startup phase (imports, dataset load, catalog build, ...), also
+    # recorded as startup.<phase> spans, and the state the health endpoint reports.
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.state = 'starting'
+        self.error = None
+        self.ready_seconds = None
+        self._thread = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            with span(f"startup.{name}"):
+                yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def mark_ready(self):
+        self.ready_seconds = time.perf_counter() - self.started
+        self.state = 'ready'
+        logger.info("ready in %.2fs: %s", self.ready_seconds,
+                    ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items()))
+
+    def mark_failed(self, exc):
+        # only the exception type, which the health endpoint reports to token holders
+        self.error = type(exc).__name__
+        self.state = 'failed'
+
+    def run(self, load):
+        # load(startup) in the calling thread; failures are logged and reported, not raised
+        try:
+            load(self)
+        except Exception as exc:
+            logger.exception("startup failed")
+            self.mark_failed(exc)
+        else:
+            self.mark_ready()
+        return self
+
+    def run_in_background(self, load):
+        # the server answers (layout shell, health checks) while the data loads
+        self._thread = threading.Thread(target=self.run, args=(load,), name='startup-loader', daemon=True)
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def status(self):
+        return {
+            'status': self.state,
+            'pid': os.getpid(),
+            'uptime_seconds': time.perf_counter() - self.started,
+            'ready_seconds': self.ready_seconds,
+            'phases': dict(self.phases),
+            'error': self.error,
+        }
+
+
+def register_health_endpoint(server, path, startup, token=None):
+    # 200 once the catalog is loaded, 503 while starting or after a failed load, so a
+    # rolling restart only routes traffic to workers that can answer callbacks. Only
+    # requests carrying the metrics token get the process details beyond the state.
+    from flask import jsonify, request
+
+    @server.route(path)
+    def dashboard_health():
+        status = startup.status() if has_token(request, token) else {'status': startup.state}
+        return jsonify(status), 200 if startup.ready else 503
+
+    return dashboard_health
@@ -0,0 +1,168 @@
+import mmap
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import ExtensionArray, ExtensionDtype, register_extension_dtype
+from pandas.api.indexers import check_array_indexer
+
+
+class TextStoreWriter:
+    # Appends one text column to disk: UTF-8 bytes back to back plus an offsets array.
+    # Written under a temp name and renamed on close, so readers never see a partial store.
+    def __init__(self, path):
+        self.path = path
+        self._tmp = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        os.makedirs(self._tmp)
+        self._data = open(os.path.join(self._tmp, 'data.bin'), 'wb')
+        self._offsets = [0]
+        self._missing = []
+
+    def extend(self, values):
+        end = self._offsets[-1]
+        for value in values:
+            missing = value is None or (isinstance(value, float) and np.isnan(value))
+            if not missing:
+                encoded = str(value).encode('utf-8')
+                self._data.write(encoded)
+                end += len(encoded)
+            self._offsets.append(end)
+            self._missing.append(missing)
+
+    def close(self):
+        self._data.close()
+        np.save(os.path.join(self._tmp, 'offsets.npy'), np.asarray(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self._tmp, 'missing.npy'), np.asarray(self._missing, dtype=bool))
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.rename(self._tmp, self.path)
+        return TextStore(self.path)
+
+
+class TextStore:
+    # Read side of TextStoreWriter: row i is decoded only when asked for.
+    def __init__(self, path):
+        self.path = path
+        self._offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        self._missing = np.load(os.path.join(path, 'missing.npy'), mmap_mode='r')
+        with open(os.path.join(path, 'data.bin'), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap refuses empty files
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    @classmethod
+    def from_values(cls, values):
+        # the same layout held in memory, for values that are not on disk
+        store = object.__new__(cls)
+        store.path = None
+        missing = [v is None or (not isinstance(v, str) and pd.isna(v)) for v in values]
+        encoded = [b'' if m else str(v).encode('utf-8') for v, m in zip(values, missing)]
+        store._offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=store._offsets[1:])
+        store._missing = np.asarray(missing, dtype=bool)
+        store._data = b''.join(encoded)
+        return store
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(os.path.join(path, 'offsets.npy'))
+
+    def __len__(self):
+        return len(self._missing)
+
+    def __getitem__(self, i):
+        if self._missing[i]:
+            return None
+        return self._data[self._offsets[i]:self._offsets[i + 1]].decode('utf-8')
+
+    def take(self, positions):
+        return [self[i] for i in positions]
+
+
+@register_extension_dtype
+class TextDtype(ExtensionDtype):
+    name = 'text_store'
+    type = str
+    na_value = np.nan
+
+    @classmethod
+    def construct_array_type(cls):
+        return TextArray
+
+
+class TextArray(ExtensionArray):
+    # Read-only string column over a TextStore: a value is decoded when it is read, so a
+    # mapped store keeps nothing per row in the process. Selections share the store and
+    # keep only their row positions; operations pandas has no shortcut for (isin, factorize,
+    # concat) see the values as an object array.
+    def __init__(self, store, positions=None):
+        self._store = store
+        self._positions = positions
+
+    @classmethod
+    def _from_sequence(cls, scalars, *, dtype=None, copy=False):
+        return cls(TextStore.from_values(list(scalars)))
+
+    @classmethod
+    def _from_factorized(cls, values, original):
+        return cls._from_sequence(values)
+
+    @classmethod
+    def _concat_same_type(cls, to_concat):
+        return cls._from_sequence([v for array in to_concat for v in array])
+
+    @property
+    def dtype(self):
+        return TextDtype()
+
+    @property
+    def nbytes(self):
+        return 0 if self._positions is None else self._positions.nbytes
+
+    def __len__(self):
+        return len(self._store) if self._positions is None else len(self._positions)
+
+    def _row(self, i):
+        return i if self._positions is None else int(self._positions[i])
+
+    def __getitem__(self, item):
+        if pd.api.types.is_integer(item):
+            if item < 0:
+                item += len(self)
+            value = self._store[self._row(item)]
+            return np.nan if value is None else value
+        item = check_array_indexer(self, item)
+        rows = np.arange(len(self))[item] if self._positions is None else self._positions[item]
+        return TextArray(self._store, np.asarray(rows, dtype=np.int64))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def isna(self):
+        missing = np.asarray(self._store._missing, dtype=bool)
+        return missing.copy() if self._positions is None else missing[self._positions]
+
+    def take(self, indices, allow_fill=False, fill_value=None):
+        indices = np.asarray(indices, dtype=np.int64)
+        if allow_fill and (indices < 0).any():
+            values = pd.api.extensions.take(np.asarray(self, dtype=object), indices, allow_fill=True,
+                                            fill_value=np.nan if fill_value is None else fill_value)
+            return self._from_sequence(values)
+        indices = np.where(indices < 0, indices + len(self), indices)
+        rows = indices if self._positions is None else self._positions[indices]
+        return TextArray(self._store, rows)
+
+    def copy(self):
+        # the values never change, so a copy can share them
+        return TextArray(self._store, self._positions)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(list(self), dtype=object if dtype is None else dtype)
+
+    def _values_for_factorize(self):
+        return np.asarray(self, dtype=object), np.nan
+
+    def __eq__(self, other):
+        return np.asarray(self, dtype=object) == other
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the app imports its packages (modules, utils, callbacks) from the app directory
+sys.path.insert(0, APP_DIR)
+
+SAMPLE_PATH = os.path.join(APP_DIR, 'data', 'amazon_kitchenware.csv')
+SAMPLE_ROWS = 40
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # runs in tmp_path, so snapshots, the price store and text spills (data/cache/...) land
+    # there; data/catalog.csv holds the first SAMPLE_ROWS sample products. Sentiment is
+    # scored without the persistent cache.
+    import pandas as pd
+    from modules.sentiment_analysis import set_default_sentiment_cache
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    pd.read_csv(SAMPLE_PATH).head(SAMPLE_ROWS).to_csv(os.path.join('data', 'catalog.csv'), index=False)
+    previous = set_default_sentiment_cache(None)
+    yield tmp_path
+    set_default_sentiment_cache(previous)
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from callbacks.renderers import render_topics
+from modules.category_stats import build_category_stats, get_category_stats
+from modules.data_processing import tag_complaints
+
+
+def frame(**columns):
+    df = pd.DataFrame({
+        'category': ['Pans', 'Pans', 'Pans', 'Knives'],
+        'price/value': [10.0, 20.0, 30.0, 40.0],
+        'reviewsCount': [1, 2, 3, 4],
+        'sentiment_score': [0.5, 0.0, -0.5, 0.2],
+        'description': ['resists leaks and rust'] * 4,
+        **columns,
+    })
+    return tag_complaints(df)
+
+
+def test_topics_count_complaints_in_reviews_only():
+    df = frame(reviews=['it leaks', 'leaks and rusted', None, 'great knife'])
+    stats = build_category_stats(df)
+    assert stats['Pans']['topic_counts'] == {'leaks': 2, 'rusted': 1}
+    assert stats['Knives']['topic_counts'] == {}
+    figure = render_topics({'category': 'Pans'}, stats['Pans'])
+    assert list(figure.data[0].x) == ['leaks', 'rusted']
+
+
+def test_topics_fall_back_to_sentiment_buckets():
+    # no review text: seller copy ("resists leaks") is not read as complaints
+    df = frame()
+    stats = build_category_stats(df)
+    assert 'complaint_keywords' not in df
+    assert stats['Pans']['sentiment_counts'] == (1, 1, 1)
+    for catalog_df in (df, frame(reviews=['great'] * 4)):
+        pans = get_category_stats(build_category_stats(catalog_df), 'Pans')
+        figure = render_topics({'category': 'Pans'}, pans)
+        assert list(figure.data[0].x) == ['Positive', 'Neutral', 'Negative']
+        assert list(figure.data[0].y) == [1, 1, 1]
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from modules.data_processing import compact_catalog, load_and_preprocess_data, load_streaming, text_spill_path
+from modules.text_store import TextStore
+
+CSV = 'data/catalog.csv'
+
+
+def test_streaming_matches_a_single_pass(workdir):
+    # the first two chunks have no brand at all: they read as float columns
+    raw = pd.read_csv(CSV)
+    raw.loc[:19, 'brand'] = np.nan
+    raw.to_csv(CSV, index=False)
+
+    streamed = load_streaming(CSV, chunksize=10, sentiment_workers=1)
+    whole = compact_catalog(load_and_preprocess_data(CSV, sentiment_workers=1))
+    assert list(streamed.columns) == list(whole.columns)
+    assert isinstance(streamed['brand'].dtype, pd.CategoricalDtype)
+    assert streamed['brand'].isna().sum() == 20
+    for col in whole.columns:
+        pd.testing.assert_series_equal(streamed[col].astype(object), whole[col].astype(object))
+    # descriptions were spilled to disk as they were read
+    spilled = TextStore(text_spill_path(CSV, 'description'))
+    assert spilled.take(range(len(raw))) == [None if pd.isna(v) else v for v in raw['description']]
@@ -0,0 +1,168 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from callbacks import renderers
+from callbacks.renderers import reads
+from modules.catalog import Catalog
+from modules.catalog_holder import CatalogHolder
+from modules.data_processing import load_and_preprocess_data
+from modules.data_service import CatalogNotReady, DataService, LocalDataService
+from utils.profiling import reset_spans, span_report
+
+
+class StubIndex:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def lookup(self, asin):
+        return self.rows.get(asin)
+
+
+class StubCatalog:
+    # what the service reads from a Catalog: version, product_index, category_of, category_stats,
+    # price_store.days; rows carry the version so renders can show which one they saw
+    def __init__(self, version, categories, days=90):
+        self.version = version
+        self.categories = categories
+        self.category_stats = {c: {'price_min': len(c)} for c in categories.values()}
+        self.price_store = SimpleNamespace(days=days)
+        self.product_index = StubIndex({asin: {'asin': asin, 'category': c, 'version': version}
+                                        for asin, c in categories.items()})
+
+    def category_of(self, asin):
+        return self.categories.get(asin)
+
+
+CATEGORIES = {'A': 'pots', 'B': 'pots', 'C': 'knives'}
+
+
+class BlockingRender:
+    # render that waits for release(); counts how often it actually ran
+    def __init__(self):
+        self.calls = 0
+        self.released = threading.Event()
+
+    def __call__(self, row):
+        self.calls += 1
+        self.released.wait(5)
+        return f"{row['asin']}@{row['version']}"
+
+    def release(self):
+        self.released.set()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met")
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def service():
+    # renders in the service's threads: the blocking stub render cannot be sent to a process
+    service = DataService(CatalogHolder(StubCatalog('v1', CATEGORIES)), workers=2, processes=0).start()
+    yield service
+    service.stop()
+
+
+def test_concurrent_renders_share_one_computation(service):
+    render = BlockingRender()
+    with ThreadPoolExecutor(8) as pool:
+        pending = [pool.submit(service.call, service.render('header', 'A', render)) for _ in range(8)]
+        # every later request is waiting on the first one's future before it finishes
+        wait_until(lambda: service.coalesced == 7)
+        render.release()
+        outputs = [p.result() for p in pending]
+    assert render.calls == 1
+    assert outputs == ['A@v1'] * 8
+    assert service.stats()['inflight'] == 0
+
+
+def test_timeout_leaves_shared_work_running(service):
+    render = BlockingRender()
+    service.timeout = 0.05
+    with pytest.raises(TimeoutError):
+        service.call(service.render('header', 'A', render))
+    render.release()
+    # the abandoned render still finishes and fills the cache for the next request
+    wait_until(lambda: service.cache.get(('header', 'A', 'v1')) is not None)
+    service.timeout = 5
+    assert service.call(service.render('header', 'A', render)) == 'A@v1'
+    assert render.calls == 1
+
+
+def test_render_inputs_come_from_the_rendered_version():
+    holder = CatalogHolder(StubCatalog('v1', CATEGORIES))
+    service = LocalDataService(holder)
+
+    @reads('category_stats')
+    def render(row, category_stats):
+        return row['version'], category_stats['price_min']
+
+    assert service.call(service.render('kpis', 'C', render)) == ('v1', len('knives'))
+    assert service.call(service.get_category_stats('pots')) == {'price_min': len('pots')}
+
+
+def test_process_renders_match_local_ones(workdir):
+    holder = CatalogHolder(Catalog.build(load_and_preprocess_data('data/catalog.csv', sentiment_workers=1)))
+    asin = holder.current.product_index.asin_at(3)
+    parts = {part: renderers.serialized(getattr(renderers, name))
+             for part, name in (('header', 'render_header'), ('price-chart', 'render_price_chart'),
+                                ('kpis', 'render_kpis'), ('radar', 'render_radar'))}
+    reset_spans()
+    service = DataService(holder, processes=1).start()
+    try:
+        outputs = {part: service.call(service.render(part, asin, render)) for part, render in parts.items()}
+    finally:
+        service.stop()
+    # timed in the worker process, recorded in this one
+    assert span_report()['render.price-chart']['count'] == 1
+    local = LocalDataService(holder)
+    for part, render in parts.items():
+        assert outputs[part] == local.call(local.render(part, asin, render))
+
+
+def test_not_ready_until_first_catalog():
+    service = LocalDataService(CatalogHolder())
+    with pytest.raises(CatalogNotReady):
+        service.call(service.render('header', 'A', lambda row: None))
+
+
+def test_reload_keeps_untouched_cache_entries():
+    holder = CatalogHolder(StubCatalog('v1', CATEGORIES))
+    service = LocalDataService(holder)
+    for part in ('prices', 'kpis'):
+        for asin in CATEGORIES:
+            service.call(service.render(part, asin, lambda row: (row['asin'], row['version'])))
+
+    # A was edited; the 'pots' category aggregates changed with it
+    holder.swap(StubCatalog('v2', CATEGORIES), asins=['A'], categories=['pots'])
+
+    def cached(part, asin):
+        return service.cache.get((part, asin, 'v2'))
+    assert cached('prices', 'A') is None
+    assert cached('kpis', 'A') is None
+    # B's own row is unchanged, but its category aggregates are not
+    assert cached('prices', 'B') == ('B', 'v1')
+    assert cached('kpis', 'B') is None
+    assert cached('prices', 'C') == ('C', 'v1')
+    assert cached('kpis', 'C') == ('C', 'v1')
+    assert len(service.cache) == 3
+
+
+def test_new_price_day_drops_history_parts():
+    holder = CatalogHolder(StubCatalog('v1', CATEGORIES))
+    service = LocalDataService(holder)
+    for part in ('prices', 'kpis', 'price-chart'):
+        service.call(service.render(part, 'C', lambda row: row['version']))
+
+    holder.swap(StubCatalog('v2', CATEGORIES, days=91), asins=['A'], categories=['pots'])
+    assert service.cache.get(('prices', 'C', 'v2')) == 'v1'
+    assert service.cache.get(('kpis', 'C', 'v2')) is None
+    assert service.cache.get(('price-chart', 'C', 'v2')) is None
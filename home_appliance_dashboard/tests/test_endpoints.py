@@ -0,0 +1,36 @@
+from flask import Flask
+
+from modules.startup import Startup, register_health_endpoint
+from utils.profiling import register_metrics_endpoint
+
+TOKEN = 's3cret'
+
+
+def client(token):
+    server = Flask(__name__)
+    startup = Startup()
+    register_metrics_endpoint(server, '/metrics', token)
+    register_health_endpoint(server, '/healthz', startup, token)
+    return server.test_client(), startup
+
+
+def test_metrics_need_the_token_whatever_the_client_address():
+    c, _ = client(TOKEN)
+    # a reverse proxy on the same host forwards every request from 127.0.0.1
+    assert c.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 403
+    assert c.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    body = c.get('/metrics', headers={'Authorization': f"Bearer {TOKEN}"}).get_json()
+    assert 'spans' in body and 'stats' in body
+    # without a configured token the endpoint does not exist
+    assert client(None)[0].get('/metrics').status_code == 404
+
+
+def test_health_reports_details_to_token_holders_only():
+    c, startup = client(TOKEN)
+    response = c.get('/healthz')
+    assert response.status_code == 503 and response.get_json() == {'status': 'starting'}
+    startup.mark_ready()
+    assert c.get('/healthz').status_code == 200
+    detail = c.get('/healthz', headers={'Authorization': f"Bearer {TOKEN}"}).get_json()
+    assert detail['status'] == 'ready' and 'phases' in detail
+    assert client(None)[0].get('/healthz', headers={'Authorization': 'Bearer '}).get_json() == {'status': 'starting'}
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.catalog import Catalog
+from modules.catalog_holder import CatalogHolder
+from modules.data_processing import load_dataset
+from modules.ingestion import CatalogWatcher, diff_rows, merge_rows
+
+CSV = 'data/catalog.csv'
+
+
+def base():
+    return pd.DataFrame({
+        'asin': ['A1', 'A2', 'A3'],
+        'title': ['Pan', 'Knife', 'Pot'],
+        'category': pd.Categorical(['Pans', 'Knives', 'Pots']),
+        'price/value': np.array([10.0, np.nan, 30.0], dtype=np.float32),
+        'stars': np.array([4, 3, 5], dtype=np.int8),
+        'price_volatility': np.zeros(3, dtype=np.float32),
+    })
+
+
+def test_merge_replaces_appends_and_removes_rows():
+    df = base()
+    updates = pd.DataFrame({
+        'asin': ['A4', 'A2'],
+        'title': ['Whisk', 'Chef knife'],
+        'category': ['Utensils', 'Knives'],
+        'price/value': [4.5, 20.0],
+        'stars': [2.0, 4.0],
+    })
+    out = merge_rows(df, updates, {'A3'})
+    assert out['asin'].tolist() == ['A1', 'A2', 'A4']
+    assert out['title'].tolist() == ['Pan', 'Chef knife', 'Whisk']
+    assert out['price/value'].tolist() == [10.0, 20.0, 4.5]
+    # the base's dtypes are kept; new categories are added
+    assert out['price/value'].dtype == np.float32 and out['stars'].dtype == np.int8
+    assert isinstance(out['category'].dtype, pd.CategoricalDtype) and out['category'][2] == 'Utensils'
+    assert out['price_volatility'].dtype == np.float32
+    # the base is left as is for readers of the old version
+    assert df['title'][1] == 'Knife' and len(df) == 3
+
+
+def test_diff_finds_new_and_changed_products():
+    df = base()
+    rows = df.drop(columns='price_volatility').astype({'category': object, 'price/value': float, 'stars': int})
+    # a missing price on both sides is not a change
+    assert diff_rows(rows, df) == []
+    rows.loc[0, 'title'] = 'Frying pan'
+    rows.loc[3] = ['A9', 'Lid', 'Lids', 1.0, 3]
+    assert diff_rows(rows, df) == ['A1', 'A9']
+
+
+def test_watcher_applies_edited_added_and_deleted_files(workdir):
+    holder = CatalogHolder(Catalog.build(load_dataset(CSV)))
+    watcher = CatalogWatcher(holder, 'data', initial_files=[CSV])
+    first = holder.current
+    assert not watcher.poll()
+
+    raw = pd.read_csv(CSV)
+    # rewritten with the same rows: nothing to swap
+    raw.to_csv(CSV, index=False)
+    assert watcher.poll() and holder.current is first
+
+    extra = raw.head(2).assign(asin=['NEW1', 'NEW2'], title=['Egg timer', 'Salad spinner'])
+    extra.to_csv(os.path.join('data', 'extra.csv'), index=False)
+    assert watcher.poll()
+    catalog = holder.current
+    assert catalog.version != first.version and len(catalog.df) == len(first.df) + 2
+    assert catalog.product_index.get('NEW2')['title'] == 'Salad spinner'
+    assert catalog.search_index.best('Egg timer') == 'NEW1'
+
+    os.remove(os.path.join('data', 'extra.csv'))
+    assert watcher.poll()
+    assert holder.current.product_index.get('NEW1') is None and len(holder.current.df) == len(first.df)
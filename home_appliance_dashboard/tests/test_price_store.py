@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.price_store import DIP_MEAN_WINDOW, DIP_MIN_WINDOW, POINTER, PriceStore
+
+ASINS = ['B', 'A', 'C']
+
+
+def store(days=40, seed=0):
+    rng = np.random.default_rng(seed)
+    history = rng.uniform(10, 20, size=(days, len(ASINS))).astype(np.float32)
+    # a gap, as for a product that was not listed that day
+    history[5, 1] = np.nan
+    return PriceStore(ASINS, '2024-01-01', list(history), history[-1].astype(float)), history
+
+
+def next_day(prices):
+    return prices.dates[-1] + pd.Timedelta(days=1)
+
+
+def test_rolling_values_match_a_direct_computation():
+    prices, history = store()
+    frame = pd.DataFrame(history.astype(float))
+    rolling_min = frame.rolling(DIP_MIN_WINDOW).min().to_numpy()
+    rolling_mean = frame.rolling(DIP_MEAN_WINDOW, min_periods=1).mean().to_numpy()
+    window = prices.window('A')
+    assert np.allclose(window['rolling_mean'], rolling_mean[:, 1], rtol=1e-5)
+    # the direct min skips the gap's windows; the store's min is NaN there too
+    assert np.allclose(window['rolling_min'], rolling_min[:, 1], rtol=1e-5, equal_nan=True)
+    assert np.allclose(np.stack(prices.rolling_min), rolling_min, rtol=1e-5, equal_nan=True)
+
+
+def test_changes_leave_the_original_store_as_is():
+    prices, history = store()
+    grown = prices.synced(['A', 'C'], [1.0, 2.0], end=next_day(prices))
+    assert grown.days == prices.days + 1 and prices.days == len(history)
+    assert np.isnan(grown.window('B')['price'].iloc[-1])
+    added = grown.add_products(['D'], np.full((1, grown.days), 5.0), [5.0])
+    assert 'D' in added and 'D' not in grown
+    synced = added.synced(['A', 'D'], [3.0, 5.0], end=added.dates[-1])
+    assert synced.window('A')['price'].iloc[-1] == 3.0
+    assert added.window('A')['price'].iloc[-1] == 1.0
+    # nothing changed, so the same store comes back
+    assert synced.synced(['A', 'D'], [3.0, 5.0], end=added.dates[-1]) is synced
+
+
+def test_saved_store_loads_back(tmp_path):
+    directory = str(tmp_path / 'price_store')
+    prices, _ = store()
+    version = prices.save(directory)
+    loaded = PriceStore.load(directory)
+    assert list(loaded.asins) == ASINS and loaded.start == prices.start
+    pd.testing.assert_frame_equal(loaded.window('C'), prices.window('C'))
+    # saving a store that is all on disk writes nothing
+    assert loaded.save(directory) == version
+    grown = loaded.synced(['A'], [1.0], end=next_day(loaded))
+    assert grown.save(directory) != version
+    # the unchanged days are shared with the previous version
+    day = f"{prices.dates[0].date()}.npy"
+    assert os.path.samefile(os.path.join(version, 'days', day), os.path.join(grown._version, 'days', day))
+    assert PriceStore.load(directory).days == prices.days + 1
+
+
+def test_the_last_of_interleaved_saves_is_loaded(tmp_path):
+    directory = str(tmp_path / 'price_store')
+    prices, _ = store()
+    prices.save(directory)
+    # two workers load the same version and save different changes
+    first = PriceStore.load(directory)
+    first = first.synced(['A'], [1.0], end=next_day(first))
+    second = PriceStore.load(directory).add_products(['D'], np.full((1, prices.days), 5.0), [5.0])
+    first.save(directory)
+    second.save(directory)
+    loaded = PriceStore.load(directory)
+    assert 'D' in loaded and loaded.days == prices.days
+    with open(os.path.join(directory, POINTER), encoding='utf-8') as f:
+        assert os.path.join(directory, f.read()) == second._version
+    # a later save removes the versions before the one it replaced
+    loaded.synced(['A'], [2.0], end=loaded.dates[-1]).save(directory)
+    assert len([name for name in os.listdir(directory) if name.startswith('v-')]) == 2
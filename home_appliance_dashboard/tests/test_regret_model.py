@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from modules.price_store import PriceStore
+from modules.regret_model import RegretModel, history_labels, load_or_train
+
+PRODUCTS = 40
+
+
+def catalog(seed=0):
+    # every other product is listed at its history's low, the rest at its high
+    rng = np.random.default_rng(seed)
+    asins = [f"A{i:02d}" for i in range(PRODUCTS)]
+    history = rng.uniform(10, 20, size=(30, PRODUCTS)).astype(np.float32)
+    low = np.arange(PRODUCTS) % 2 == 0
+    price = np.where(low, history.min(axis=0), history.max(axis=0)).astype(float)
+    store = PriceStore(asins, '2024-01-01', list(history), price)
+    df = pd.DataFrame({
+        'asin': asins,
+        'category': ['Pans', 'Knives'] * (PRODUCTS // 2),
+        'price/value': price,
+        'stars': rng.uniform(3, 5, PRODUCTS),
+        'reviewsCount': rng.integers(1, 1000, PRODUCTS),
+        'sentiment_score': rng.uniform(-1, 1, PRODUCTS),
+        'description': [''] * PRODUCTS,
+        'price_volatility': store.volatility(),
+        # the category heuristic's flag is not the label
+        'no_regret': ~low,
+    })
+    return df, store, low
+
+
+def test_labels_come_from_the_products_own_history():
+    df, store, low = catalog()
+    assert (history_labels(df, store) == low).all()
+    # products without a stored history are never labelled
+    unknown = df.assign(asin=['X'] * PRODUCTS)
+    assert not history_labels(unknown, store).any()
+
+
+def test_trained_model_is_saved_and_reloaded(tmp_path):
+    df, store, _ = catalog()
+    path = str(tmp_path / 'regret_model.joblib')
+    load_or_train(df, store, path=path)
+    saved = RegretModel.load(path)
+    assert saved.meta['rows'] + saved.meta['holdout_rows'] == PRODUCTS
+    assert saved.predict(pd.DataFrame(0.0, index=range(3), columns=saved.meta['features'])).shape == (3,)
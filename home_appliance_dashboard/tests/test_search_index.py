@@ -0,0 +1,71 @@
+import pandas as pd
+
+from modules import catalog as catalog_module
+from modules.catalog import Catalog
+from modules.data_processing import load_and_preprocess_data
+from modules.search_index import SearchIndex
+
+PRODUCTS = pd.DataFrame({
+    'asin': ['A1', 'A2', 'A3', 'A4', 'A1'],
+    'title': ['Chef Knife 8 inch', 'Pizza Cutter (wheel)', 'Knife Block Set', 'Scale', 'duplicate'],
+    'brand': ['Oxo', 'Dreamfarm', 'Cuisinart', 'Escali', 'Oxo'],
+    'category': ['Knives', 'Gadgets', 'Knives', 'Scales', 'Knives'],
+})
+
+
+def test_substring_queries_rank_by_field_and_position():
+    index = SearchIndex.from_frame(PRODUCTS)
+    assert len(index) == 4
+    # a title starting with the query beats a later word in it, which beats the category
+    assert index.search('knife') == ['A3', 'A1']
+    assert index.search('knives') == ['A1', 'A3']
+    assert index.search('chef knife') == ['A1']
+    # regex metacharacters are plain text
+    assert index.search('(wheel)') == ['A2']
+    assert index.search('.*') == []
+
+
+def test_short_queries_put_word_prefixes_before_substrings():
+    index = SearchIndex.from_frame(PRODUCTS)
+    # 'inch' starts a word, 'cuisinart' only contains it
+    assert index.search('in') == ['A1', 'A3']
+    assert index.search('in', k=1) == ['A1']
+    assert index.search('zz') == ['A2']
+    # the last two characters of a field, where no trigram starts
+    assert index.search('xo') == ['A1']
+    assert index.best('xq') is None
+
+
+def test_saved_postings_answer_the_same(tmp_path):
+    index = SearchIndex.from_frame(PRODUCTS)
+    index.save(str(tmp_path / 'search'), 'v1')
+    assert SearchIndex.load(str(tmp_path / 'search'), 'v2') is None
+    loaded = SearchIndex.load(str(tmp_path / 'search'), 'v1')
+    for q in ('knife', 'in', 'zz', 'xo', 'k'):
+        assert loaded.search(q) == index.search(q)
+
+
+def test_overlay_add_and_remove():
+    index = SearchIndex.from_frame(PRODUCTS)
+    updated = index.copy()
+    updated.remove('A1')
+    updated.add('B1', 'Bread Knife', 'Mercer', 'Knives')
+    assert updated.search('knife') == ['A3', 'B1']
+    assert updated.search('zz') == ['A2']
+    assert updated.search('br') == ['B1']
+    assert updated.overlay_size() == 2
+    # the copy it was made from is untouched
+    assert index.search('knife') == ['A3', 'A1']
+
+
+def test_reload_folds_a_large_overlay(workdir, monkeypatch):
+    df = load_and_preprocess_data('data/catalog.csv', sentiment_workers=1)
+    catalog = Catalog.build(df)
+    asins = list(df['asin'][:3])
+    df.loc[df['asin'].isin(asins), 'title'] = 'Edited zzyzx'
+    assert catalog.updated(df, asins, [], set()).search_index.overlay_size() == 6
+
+    monkeypatch.setattr(catalog_module, 'OVERLAY_MAX', 5)
+    search_index = catalog.updated(df, asins, [], set()).search_index
+    assert search_index.overlay_size() == 0
+    assert search_index.search('zzyzx') == asins
@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+
+from modules.catalog import Catalog
+from modules.catalog_holder import CatalogHolder
+from modules.data_processing import load_dataset
+from modules.ingestion import CatalogWatcher
+from modules.search_index import SearchIndex
+from modules.shared_dataset import ENV_VAR, attach_dataset, load_worker_dataset, publish_dataset
+from modules.text_store import TextDtype
+
+CSV = 'data/catalog.csv'
+
+
+def test_attach_maps_the_published_dataset(workdir, monkeypatch):
+    assert attach_dataset('shm') is None
+    path = publish_dataset(CSV, 'shm')
+    df = attach_dataset('shm')
+    expected = load_dataset(CSV)
+    pd.testing.assert_frame_equal(df.astype(object), expected.astype(object))
+    # the search index was built and saved into the snapshot by the publisher
+    assert SearchIndex.load(os.path.join(path, 'search')) is not None
+    assert list(attach_dataset('shm', columns=['asin']).columns) == ['asin']
+    monkeypatch.setenv(ENV_VAR, 'shm')
+    assert isinstance(load_worker_dataset(CSV)['title'].dtype, TextDtype)
+
+    # a republished source replaces the snapshot the pointer names
+    raw = pd.read_csv(CSV)
+    raw.head(10).to_csv(CSV, index=False)
+    newer = publish_dataset(CSV, 'shm')
+    assert newer != path and not os.path.exists(path)
+    assert len(attach_dataset('shm')) == 10
+
+
+def test_reload_over_attached_dataset(workdir):
+    publish_dataset(CSV, 'shm')
+    df = attach_dataset('shm')
+    assert isinstance(df['title'].dtype, TextDtype)
+    holder = CatalogHolder(Catalog.build(df))
+    watcher = CatalogWatcher(holder, 'data', initial_files=[CSV])
+
+    raw = pd.read_csv(CSV)
+    raw.loc[0, 'title'] = 'Edited title'
+    raw.loc[1, 'price/value'] = 3.21
+    raw.to_csv(CSV, index=False)
+    assert watcher.poll()
+
+    catalog = holder.current
+    assert catalog.product_index.get(raw['asin'][0])['title'] == 'Edited title'
+    assert catalog.product_index.get(raw['asin'][1])['price/value'] == 3.21
+    assert catalog.search_index.best('Edited title') == raw['asin'][0]
+    # the text columns are rebuilt in the same read-only layout
+    assert isinstance(catalog.df['title'].dtype, TextDtype)
+    assert len(catalog.df) == len(df)
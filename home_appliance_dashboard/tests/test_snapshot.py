@@ -0,0 +1,54 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.snapshot import MANIFEST, attachment_path, load_snapshot, save_snapshot
+from modules.text_store import TextDtype
+
+
+def frame():
+    # a mostly-unique string column (stored as text), a repeated one (stored as codes),
+    # a categorical and numeric columns, each with a missing value
+    return pd.DataFrame({
+        'asin': ['A1', 'A2', 'A3', None],
+        'brand': ['Oxo', 'Oxo', None, 'Oxo'],
+        'category': pd.Categorical(['Pans', 'Knives', 'Pans', None]),
+        'price/value': [1.5, np.nan, 3.0, 4.0],
+        'stars': np.array([1, 2, 3, 4], dtype=np.int8),
+        'no_regret': [True, False, True, False],
+    })
+
+
+def test_round_trip_keeps_values_and_dtypes(tmp_path):
+    df = frame()
+    path = save_snapshot(df, str(tmp_path / 'catalog.snapshot'))
+    loaded = load_snapshot(path)
+    pd.testing.assert_frame_equal(loaded, df)
+    assert attachment_path(loaded, 'search') == os.path.join(path, 'search')
+    # a snapshot-backed copy can be written to without touching the files
+    loaded.loc[0, 'price/value'] = 9.0
+    assert load_snapshot(path)['price/value'][0] == 1.5
+    assert list(load_snapshot(path, columns=['asin', 'stars']).columns) == ['asin', 'stars']
+
+
+def test_shared_load_maps_strings_read_only(tmp_path):
+    df = frame()
+    path = save_snapshot(df, str(tmp_path / 'catalog.snapshot'))
+    shared = load_snapshot(path, shared=True)
+    assert isinstance(shared['asin'].dtype, TextDtype)
+    assert isinstance(shared['brand'].dtype, pd.CategoricalDtype)
+    assert not shared['price/value'].to_numpy().flags.writeable
+    pd.testing.assert_frame_equal(shared.astype(object), df.astype(object))
+
+
+def test_incomplete_or_old_snapshots_are_ignored(tmp_path):
+    path = save_snapshot(frame(), str(tmp_path / 'catalog.snapshot'))
+    with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    with open(os.path.join(path, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(dict(manifest, format=manifest['format'] - 1), f)
+    assert load_snapshot(path) is None
+    os.remove(os.path.join(path, MANIFEST))
+    assert load_snapshot(path) is None
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from modules.text_store import TextArray, TextDtype, TextStore, TextStoreWriter
+
+VALUES = ['pan', None, 'knife', np.nan, '', 'crème brûlée torch', 'pan']
+
+
+def written(tmp_path):
+    # written in two chunks, as load_streaming spills a column
+    writer = TextStoreWriter(str(tmp_path / 'title.text'))
+    writer.extend(VALUES[:3])
+    writer.extend(VALUES[3:])
+    return writer.close()
+
+
+def test_store_reads_back_what_was_written(tmp_path):
+    store = written(tmp_path)
+    assert TextStore.exists(store.path)
+    expected = [None if v is None or v is np.nan else v for v in VALUES]
+    assert len(store) == len(VALUES)
+    assert store.take(range(len(store))) == expected
+    assert TextStore(store.path).take([5, 0]) == [expected[5], 'pan']
+    assert TextStore.from_values(VALUES).take(range(len(VALUES))) == expected
+
+
+def test_series_over_a_store(tmp_path):
+    s = pd.Series(TextArray(written(tmp_path)))
+    assert isinstance(s.dtype, TextDtype)
+    assert s[2] == 'knife' and pd.isna(s[1])
+    assert s.isna().tolist() == [False, True, False, True, False, False, False]
+    # selections keep row positions into the same store
+    picked = s[s.notna()].iloc[[3, 0]]
+    assert isinstance(picked.array, TextArray) and picked.array._store is s.array._store
+    assert picked.tolist() == ['crème brûlée torch', 'pan']
+    # a reindex with missing rows fills them with NaN
+    assert s.reindex([2, 10]).isna().tolist() == [False, True]
+    assert (s == 'pan').tolist() == [True, False, False, False, False, False, True]
+    assert s.isin(['knife']).sum() == 1
+    assert s.value_counts()['pan'] == 2
+    joined = pd.concat([s.iloc[:1], s.iloc[2:3]], ignore_index=True)
+    assert joined.tolist() == ['pan', 'knife']
+    values = s.astype(object)
+    assert values[0] == 'pan' and pd.isna(values[1]) and values[4] == ''
@@ -1,6 +1,109 @@
-CATEGORY_COLORS = {
-    'Digital Scales': '#636EFA',
-    'Trash Bags': '#EF553B',
-    'Choppers': '#00CC96',
-}
-PRICE_STEP = 1.0
+CATEGORY_COLORS = {
+    'Digital Scales': '#636EFA',
+    'Trash Bags': '#EF553B',
+    'Choppers': '#00CC96',
+}
+PRICE_STEP = 1.0
+
+# on-disk sentiment score cache, shared by all worker processes on a host
+SENTIMENT_CACHE_PATH = 'data/cache/sentiment.sqlite'
+SENTIMENT_CACHE_MAX_ENTRIES = 500_000
+# how process pools (sentiment scoring, rendering) start their workers: forking a process that
+# already runs threads (the background catalog loader, request threads) can deadlock the child
+POOL_START_METHOD = 'spawn'
+
+# default tmpfs directory a loader process publishes the preprocessed dataset into; workers
+# attach to the directory named by the DASHBOARD_SHARED_DATASET environment variable
+SHARED_DATASET_DIR = '/dev/shm/kitchenware-dashboard'
+
+# day-bucketed price history store behind the price chart and volatility KPI
+PRICE_STORE_DIR = 'data/cache/price_store'
+
+# rendered outputs of update_product cached per (ASIN, dataset version)
+PRODUCT_CACHE_SIZE = 1024
+# store figures as plain JSON dicts instead of plotly Figure objects
+PRODUCT_CACHE_SERIALIZE = False
+
+# product dropdown options shipped per page / per search
+DROPDOWN_PAGE_SIZE = 50
+
+# simulated competitor offers: (button label, price delta vs. our price)
+COMPETITOR_OFFERS = [
+    ('Official Website', -0.05),
+    ('JD.com', 0.07),
+    ('Suning', 0.25),
+    ('Tmall Official', 0.25),
+]
+# simulated "was" price as a multiple of the current price
+WAS_PRICE_RATIO = 1.2
+# format the price, savings and competitor buttons in the browser (assets/clientside.js)
+CLIENTSIDE_FORMATTING = True
+
+# poll the data directory and swap in changed CSV rows without a restart (modules/ingestion.py)
+HOT_RELOAD = True
+HOT_RELOAD_INTERVAL = 5.0
+
+# CSVs at least this large are read in chunks of CSV_CHUNK_ROWS rows instead of all at once
+STREAM_MIN_BYTES = 256 * 1024 * 1024
+CSV_CHUNK_ROWS = 100_000
+# descriptions of streamed catalogs are spilled here after scoring (modules/text_store.py)
+TEXT_SPILL_DIR = 'data/cache/text'
+
+# load the catalog in compact dtypes (modules/data_processing.compact_catalog)
+COMPACT_CATALOG = True
+
+# customer review text, when the catalog has such a column: complaint keywords are only counted
+# there, since descriptions are seller copy. Without it "Review Topics" shows sentiment buckets.
+REVIEW_TEXT_COLUMN = 'reviews'
+# complaint terms counted in review text for the "Review Topics" panel
+COMPLAINT_KEYWORDS = [
+    'broke', 'broken', 'cheap', 'cracked', 'defective', 'difficult to clean', 'disappointed',
+    'doesn\'t work', 'flimsy', 'hard to clean', 'leak', 'leaks', 'leaking', 'melted', 'missing',
+    'poor quality', 'refund', 'return', 'returned', 'rust', 'rusted', 'smell', 'stopped working',
+    'too small', 'waste of money', 'wobbly', 'worst',
+]
+# bars in the "Review Topics" panel (the category's most mentioned complaint keywords)
+TOPICS_SHOWN = 8
+
+# fitted "No Regret" model (modules/regret_model.py), e.g. 'data/cache/regret_model.joblib':
+# trained on first start when missing. Ships disabled: None keeps the category 10th-percentile
+# price heuristic. Its label comes from each product's stored price history, and on the sample
+# catalog those are synthesized around the listed price: no product is labelled, nothing is
+# trained and setting a path changes no badge until real daily prices have been stored
+REGRET_MODEL_PATH = None
+# training label: today's price at or below this quantile of the product's own stored history
+REGRET_LABEL_QUANTILE = 0.1
+# badge shown when the model's no-regret probability reaches this
+NO_REGRET_THRESHOLD = 0.5
+# share of products held out from training to score the model, and the held-out ROC AUC it
+# needs before its probabilities replace the heuristic badge
+REGRET_HOLDOUT_FRACTION = 0.25
+REGRET_MIN_HOLDOUT_AUC = 0.8
+
+# span timings and cache stats as JSON (utils/profiling.py), served only when the
+# DASHBOARD_METRICS_TOKEN environment variable sets a token, which requests send as
+# `Authorization: Bearer <token>`. The client address is no check: behind a reverse proxy on
+# the same host every request comes from 127.0.0.1. The token also unlocks the health
+# endpoint's startup details.
+METRICS_PATH = '/_dashboard/metrics'
+METRICS_TOKEN_ENV = 'DASHBOARD_METRICS_TOKEN'
+# recent durations per span kept for percentiles / histograms
+SPAN_WINDOW = 2048
+# fraction of callback calls run under cProfile (0 = off), dumped to PROFILE_DIR
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_DIR = 'data/cache/profiles'
+
+# load the catalog in a background thread and serve the layout shell immediately (modules/startup.py)
+DEFERRED_STARTUP = True
+# how often the page checks whether the catalog has finished loading
+STARTUP_POLL_INTERVAL_MS = 500
+# 200 once the catalog is loaded, 503 before; for load balancer / rolling restart health checks
+HEALTH_PATH = '/healthz'
+
+# threads rendering panels for the callbacks (modules/data_service.py) and how long a
+# callback waits for its result
+DATA_SERVICE_WORKERS = 4
+DATA_SERVICE_TIMEOUT = 30.0
+# processes the panels are drawn in, so figure building runs outside the request process's GIL;
+# None: one per CPU where there is more than one, 0: draw in the service's threads
+DATA_SERVICE_PROCESSES = None
@@ -1,6 +1,17 @@
-def normalize_series(series):
-    min_val = series.min()
-    max_val = series.max()
-    if max_val - min_val == 0:
-        return series*0
-    return (series - min_val) / (max_val - min_val)
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.constants import POOL_START_METHOD
+
+
+def normalize_series(series):
+    min_val = series.min()
+    max_val = series.max()
+    if max_val - min_val == 0:
+        return series*0
+    return (series - min_val) / (max_val - min_val)
+
+
+def process_pool(workers):
+    # worker processes started with POOL_START_METHOD; they import what they run themselves
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD))
@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    # Bounded least-recently-used cache with hit/miss counters; safe to share between threads.
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def rekey(self, fn):
+        # fn(key) -> new key, or None to drop the entry; recency order is kept and
+        # an entry already stored under the new key wins over a migrated one
+        with self._lock:
+            data = OrderedDict()
+            for key, value in self._data.items():
+                new_key = fn(key)
+                if new_key is not None and new_key not in self._data:
+                    data[new_key] = value
+                elif new_key is not None and new_key == key:
+                    data[key] = value
+            self._data = data
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,144 @@
+import cProfile
+import hmac
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.constants import PROFILE_DIR, PROFILE_SAMPLE_RATE, SPAN_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# histogram bucket upper bounds in milliseconds
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+HISTOGRAM_LABELS = [f"le_{b:g}ms" for b in HISTOGRAM_BUCKETS_MS[:-1]] + ['le_inf']
+
+
+class SpanStats:
+    # Lifetime count/total/max plus the last `window` durations, which the percentiles and
+    # histogram are computed from, so they follow current behaviour rather than all-time.
+    def __init__(self, window=SPAN_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._recent.append(seconds)
+
+    def report(self):
+        with self._lock:
+            recent = np.asarray(self._recent) * 1000
+            count, total, peak = self.count, self.total, self.max
+        report = {'count': count, 'mean_ms': total * 1000 / count if count else 0.0, 'max_ms': peak * 1000}
+        if len(recent):
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+            counts, _ = np.histogram(recent, bins=[0] + HISTOGRAM_BUCKETS_MS)
+            report.update(p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99),
+                          histogram={label: int(c) for label, c in zip(HISTOGRAM_LABELS, counts)})
+        return report
+
+
+_spans = {}
+_stats_providers = {}
+_lock = threading.Lock()
+
+
+def record(name, seconds):
+    stats = _spans.get(name)
+    if stats is None:
+        with _lock:
+            stats = _spans.setdefault(name, SpanStats())
+    stats.add(seconds)
+
+
+@contextmanager
+def span(name):
+    # time the block under `name` (exceptions included)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def span_report():
+    with _lock:
+        spans = dict(_spans)
+    return {name: stats.report() for name, stats in sorted(spans.items())}
+
+
+def reset_spans():
+    with _lock:
+        _spans.clear()
+
+
+def register_stats(name, provider):
+    # provider() -> JSON-able dict included in the metrics endpoint (e.g. LRUCache.stats)
+    _stats_providers[name] = provider
+
+
+@contextmanager
+def sampled_profile(name, rate=None, directory=PROFILE_DIR):
+    # With probability `rate` (PROFILE_SAMPLE_RATE by default, 0 = off) run the block under
+    # cProfile and dump the stats to directory/<name>-<time>-<pid>.prof for pstats/snakeviz.
+    rate = PROFILE_SAMPLE_RATE if rate is None else rate
+    if rate <= 0 or random.random() >= rate:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is already active on this thread
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{name}-{time.time_ns()}-{os.getpid()}.prof")
+            profiler.dump_stats(path)
+        except OSError as exc:
+            logger.warning("could not write profile for %s: %s", name, exc)
+
+
+def has_token(request, token):
+    # whether the request sends `Authorization: Bearer <token>`; never without a token
+    sent = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(sent.encode(), f"Bearer {token}".encode())
+
+
+def register_metrics_endpoint(server, path, token):
+    # JSON span report and registered stats on the Flask server, for requests carrying the
+    # token; not served at all without one
+    from flask import abort, jsonify, request
+
+    if not token:
+        return None
+
+    @server.route(path)
+    def dashboard_metrics():
+        if not has_token(request, token):
+            abort(403)
+        stats = {}
+        for name, provider in list(_stats_providers.items()):
+            try:
+                stats[name] = provider()
+            except Exception as exc:
+                stats[name] = {'error': str(exc)}
+        return jsonify({'pid': os.getpid(), 'spans': span_report(), 'stats': stats})
+
+    return dashboard_metrics